@@ -51,8 +51,9 @@ network.snapshots
 
 
 # load electricity demand data
-df_elec = pd.read_csv('data/electricity_demand.csv', sep=';', index_col=0) # in MWh
-df_elec.index = pd.to_datetime(df_elec.index) #change index to datatime
+# the csv file is parsed once and stored in data/cache, later runs read the binary cache
+from data_cache import load_demand
+df_elec = load_demand('electricity') # in MWh
 print(df_elec['ESP'].head())
 
 
@@ -112,9 +113,9 @@ network.add("Carrier", "onshorewind")
 network.add("Carrier", "solar")
 
 # add onshore wind generator
-df_onshorewind = pd.read_csv('data_extra/onshore_wind_1979-2017.csv', sep=';', index_col=0)
-df_onshorewind.index = pd.to_datetime(df_onshorewind.index)
-CF_wind = df_onshorewind['ESP'][[hour.strftime("%Y-%m-%dT%H:%M:%SZ") for hour in network.snapshots]]
+# get_cf parses the capacity factors file once and selects the snapshots by position
+from capacity_factors import get_cf
+CF_wind = get_cf('onshorewind', 'ESP', network.snapshots)
 capital_cost_onshorewind = annuity(30,0.07)*910000*(1+0.033) # in €/MW
 network.add("Generator",
             "onshorewind",
@@ -127,9 +128,7 @@ network.add("Generator",
             p_max_pu = CF_wind)
 
 # add solar PV generator
-df_solar = pd.read_csv('data_extra/pv_optimal.csv', sep=';', index_col=0)
-df_solar.index = pd.to_datetime(df_solar.index)
-CF_solar = df_solar['ESP'][[hour.strftime("%Y-%m-%dT%H:%M:%SZ") for hour in network.snapshots]]
+CF_solar = get_cf('solar', 'ESP', network.snapshots)
 capital_cost_solar = annuity(25,0.07)*425000*(1+0.03) # in €/MW
 network.add("Generator",
             "solar",
@@ -164,14 +163,15 @@ network.add("Generator",
 network.generators_t.p_max_pu
 
 
-# We find the optimal solution using Gurobi as solver.
+# We find the optimal solution using Gurobi as solver, or HiGHS if Gurobi is not installed (see solve_network.py).
 # 
 # In this case, we are optimising the installed capacity and dispatch of every generator to minimize the total system cost.
 
 # In[10]:
 
 
-network.optimize(solver_name='gurobi')
+from solve_network import solve_network
+solve_network(network)
 
 
 # The message ('ok' , 'optimal") indicates that the optimizer has found an optimal solution. 
@@ -259,7 +259,7 @@ network.add("GlobalConstraint",
 # In[36]:
 
 
-network.optimize(solver_name='gurobi')
+solve_network(network)
 
 
 # In[37]:
@@ -509,11 +509,8 @@ n.add("Link",
 # In[47]:
 
 
-CF_wind = pd.DataFrame()
-CF_solar = pd.DataFrame()
-for i in range(len(nodes)):
-    CF_wind[nodes[i]] = df_onshorewind[nodes[i]][[hour.strftime("%Y-%m-%dT%H:%M:%SZ") for hour in n.snapshots]]
-    CF_solar[nodes[i]] = df_solar[nodes[i]][[hour.strftime("%Y-%m-%dT%H:%M:%SZ") for hour in n.snapshots]]
+CF_wind = get_cf('onshorewind', nodes, n.snapshots)
+CF_solar = get_cf('solar', nodes, n.snapshots)
 
 
 # Add generators to each node:
@@ -609,9 +606,7 @@ n.add("GlobalConstraint",
 # In[ ]:
 
 
-n.lopf(n.snapshots, 
-             pyomo=False,
-             solver_name='gurobi')
+solve_network(n)
 
 
 # In[ ]:
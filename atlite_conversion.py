@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Hourly capacity factors of every cell of an atlite cutout, converted once.
+
+cutout.wind and cutout.pv go through the whole hourly cutout every time they
+are called, with capacity_factor=True to get the mean capacity factor map and
+again with a layout to get the aggregated time series. Here the conversion is
+done once with capacity_factor_timeseries=True, the (time x y x x) array is
+saved as netCDF in 'data/cache/conversions' and opened lazily with dask
+chunks. The maps and aggregated time series are reductions of that array, so
+trying another layout (e.g. another cf_exponent) does not convert the cutout
+again:
+
+cf = capacity_factor_timeseries(cutout, 'wind', turbine="Vestas_V112_3MW")
+cap_factors_wind = mean_capacity_factor(cf)
+layout_wind = cap_factors_wind**2
+agg_cf_wind = aggregate(cf, layout_wind).to_pandas()
+"""
+
+import hashlib
+import json
+import os
+
+import xarray as xr
+
+from data_cache import CACHE_DIR
+
+CONVERSION_DIR = os.path.join(CACHE_DIR, 'conversions')
+
+# hours in every dask chunk of the cached capacity factors
+TIME_CHUNK = 24*31
+
+
+def _cutout_files(cutout):
+    path = str(cutout.path)
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, f) for f in os.listdir(path))
+    return [path]
+
+
+def conversion_path(cutout, technology, **params):
+    """File of the cached conversion, identified by the cutout (name, size and
+    modification time of its files), the technology and its parameters"""
+
+    config = {'technology': technology, 'params': params,
+              'cutout': [(os.path.abspath(f), os.path.getsize(f),
+                          os.path.getmtime(f))
+                         for f in _cutout_files(cutout)]}
+    key = hashlib.sha1(json.dumps(config, sort_keys=True, default=str)
+                       .encode()).hexdigest()
+    name = os.path.splitext(os.path.basename(str(cutout.path)))[0]
+    return os.path.join(CONVERSION_DIR, '{}_{}_{}.nc'.format(
+        name, technology, key[:12]))
+
+
+def capacity_factor_timeseries(cutout, technology, **params):
+    """(time x y x x) capacity factors of technology ('wind' or 'pv') in every
+    cell of cutout, params are passed to cutout.wind or cutout.pv (e.g.
+    turbine, panel, orientation). The array is read lazily from the cache."""
+
+    if technology not in ('wind', 'pv'):
+        raise ValueError("technology must be 'wind' or 'pv', not {!r}"
+                         .format(technology))
+    path = conversion_path(cutout, technology, **params)
+    if not os.path.exists(path):
+        convert = getattr(cutout, technology)
+        cf = convert(capacity_factor_timeseries=True, **params)
+        cf.name = 'capacity_factor'
+        os.makedirs(CONVERSION_DIR, exist_ok=True)
+        tmp = path[:-len('.nc')] + '.tmp%d.nc' % os.getpid()
+        cf.to_netcdf(tmp)
+        os.replace(tmp, path)
+    return xr.open_dataarray(path, chunks={'time': TIME_CHUNK})
+
+
+def mean_capacity_factor(cf):
+    """(y x x) map of the mean capacity factor of every cell, the same as
+    cutout.wind/pv with capacity_factor=True"""
+
+    return cf.mean('time').compute()
+
+
+def aggregate(cf, layout):
+    """Capacity factor time series of the capacity distributed as layout
+    (y x x), the same as cutout.wind/pv with layout divided by the total
+    capacity in layout"""
+
+    return (cf*layout).sum(['x', 'y']).compute()/float(layout.sum())
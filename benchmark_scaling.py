@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of how building and solving the networks scales with the number of
+nodes and snapshots.
+
+The networks are those of MESM_project.py (see network_builder.py): onshore
+wind, solar PV and OCGT at every node, H2 tanks with electrolysis and fuel
+cell links, and links between every pair of nodes. The nodes are countries
+with demand in data/electricity_demand.csv (1, 3, 10 and 30 nodes by
+default) and the year is resampled to 8760, 2920 (3 hours) and 730 (12
+hours) snapshots.
+
+Every case is run in a new process, recording the time to build the network,
+to resample it to the number of snapshots, to create the linear model and to
+solve it, and the peak memory of the process. The results are written to a
+JSON file and compared with a baseline (a results file of an earlier run, on
+the same machine, a warning is given otherwise), showing the cases that
+became slower or use more memory, e.g.
+
+python benchmark_scaling.py --nodes 1 3 10 --snapshots 730 2920
+python benchmark_scaling.py --save-baseline
+python benchmark_scaling.py --baseline results/scaling_baseline.json
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from data_cache import load_demand
+from instrumentation import peak_rss
+from network_builder import build_network, set_co2_limit
+from solve_network import pick_solver, solver_options
+from time_aggregation import resample
+
+NODES = [1, 3, 10, 30]
+SNAPSHOTS = [8760, 2920, 730]
+
+# the examples of MESM_project.py for 1 and 3 nodes
+EXAMPLE_COUNTRIES = {1: 'ESP', 3: ['DNK', 'NOR', 'SWE']}
+
+RESULTS_FILE = 'results/scaling_benchmark.json'
+BASELINE_FILE = 'results/scaling_baseline.json'
+
+MEASURES = ['build_time', 'resample_time', 'model_time', 'solve_time',
+            'peak_memory']
+
+# ratio to the baseline above which a measure is a regression
+TOLERANCE = 1.2
+
+
+def benchmark_countries(n_nodes):
+    """Countries of the network with n_nodes nodes"""
+
+    if n_nodes in EXAMPLE_COUNTRIES:
+        return EXAMPLE_COUNTRIES[n_nodes]
+    countries = list(load_demand('electricity').columns)
+    if n_nodes > len(countries):
+        raise ValueError('there is demand for {} countries only'.format(
+            len(countries)))
+    return countries[:n_nodes]
+
+
+def run_case(n_nodes, n_snapshots, solver_name, mode='default',
+             threads=None, co2_limit=None):
+    """Build and solve the network with n_nodes and n_snapshots, return the
+    times in seconds, the peak memory of the process in MB, the size of the
+    linear problem and the objective"""
+
+    start = time.perf_counter()
+    network = build_network(benchmark_countries(n_nodes), h2_storage=True)
+    if co2_limit is not None:
+        set_co2_limit(network, co2_limit)
+    built = time.perf_counter()
+    if n_snapshots != len(network.snapshots):
+        network = resample(network, n_snapshots)
+    resampled = time.perf_counter()
+    model = network.optimize.create_model()
+    created = time.perf_counter()
+    status, condition = network.optimize.solve_model(
+        solver_name=solver_name,
+        solver_options=solver_options(solver_name, mode, threads))
+    solved = time.perf_counter()
+
+    return {'nodes': n_nodes,
+            'snapshots': n_snapshots,
+            'solver': solver_name,
+            'mode': mode,
+            'status': status,
+            'condition': condition,
+            'objective': network.objective,
+            'variables': model.nvars,
+            'constraints': model.ncons,
+            'build_time': built - start,
+            'resample_time': resampled - built,
+            'model_time': created - resampled,
+            'solve_time': solved - created,
+            'peak_memory': peak_rss()}
+
+
+def benchmark(nodes=NODES, snapshots=SNAPSHOTS, solver_name=None,
+              mode='default', threads=None, co2_limit=None):
+    """Run every combination of nodes and snapshots, one process for each
+    run so that the peak memory is measured separately. Returns the results
+    with a description of the machine."""
+
+    solver_name = pick_solver(solver_name)
+    context = multiprocessing.get_context('spawn')
+    cases = []
+    for n_nodes in nodes:
+        for n_snapshots in snapshots:
+            with ProcessPoolExecutor(1, mp_context=context) as executor:
+                cases.append(executor.submit(
+                    run_case, n_nodes, n_snapshots, solver_name, mode,
+                    threads, co2_limit).result())
+    return {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'machine': {'node': platform.node(),
+                        'processor': platform.processor(),
+                        'cpus': os.cpu_count(),
+                        'python': platform.python_version()},
+            'cases': cases}
+
+
+def write_results(results, path=RESULTS_FILE):
+    """Write the results of benchmark to the JSON file in path"""
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=1)
+
+
+def read_results(path):
+    """Results in a results file, as returned by benchmark"""
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Ratio of every measure to the baseline (results of an earlier run) for
+    the cases in both, with a column 'regression' listing the measures above
+    tolerance. Warns if the baseline was run on another machine."""
+
+    if baseline['machine'] != results['machine']:
+        warnings.warn('the baseline was run on another machine ({}) than the '
+                      'results ({}), the measures are not comparable'.format(
+                          baseline['machine'], results['machine']))
+    keys = ['nodes', 'snapshots', 'solver', 'mode']
+    current = pd.DataFrame(results['cases']).set_index(keys)[MEASURES]
+    # baselines written before a measure was added have no column for it
+    baseline = pd.DataFrame(baseline['cases']).set_index(keys).reindex(
+        columns=MEASURES)
+    ratio = (current/baseline).dropna(how='all')
+    ratio['regression'] = [', '.join(m for m in MEASURES if row[m] > tolerance)
+                           for _, row in ratio.iterrows()]
+    return ratio
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--nodes', nargs='+', type=int, default=NODES)
+    parser.add_argument('--snapshots', nargs='+', type=int,
+                        default=SNAPSHOTS)
+    parser.add_argument('--solver')
+    parser.add_argument('--mode', default='default')
+    parser.add_argument('--threads', type=int)
+    parser.add_argument('--co2-limit', type=float)
+    parser.add_argument('--output', default=RESULTS_FILE)
+    parser.add_argument('--baseline', help='results file to compare with')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='copy the results to ' + BASELINE_FILE)
+    args = parser.parse_args()
+
+    results = benchmark(args.nodes, args.snapshots, args.solver, args.mode,
+                        args.threads, args.co2_limit)
+    write_results(results, args.output)
+    print(pd.DataFrame(results['cases']).to_string(index=False))
+    if args.baseline:
+        comparison = compare(results, read_results(args.baseline),
+                             args.tolerance)
+        print(comparison.round(2).to_string())
+        regressions = comparison[comparison.regression != '']
+        print('{} of {} cases slower or larger than the baseline'.format(
+            len(regressions), len(comparison)))
+    if args.save_baseline:
+        shutil.copyfile(args.output, BASELINE_FILE)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the solvers installed on the machine for the examples in
+MESM_project.py: the single-node network (ESP) and the multi-node network
+(DNK, NOR, SWE with H2 storage and no CO2 emissions).
+
+For every example, solver and mode (see solve_network.py) the network is
+built, the linear problem is created and solved in a new process, recording
+the time of every step and the peak memory of the process, e.g.
+
+python benchmark_solvers.py --solvers highs gurobi --modes default screening
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import linopy
+import pandas as pd
+
+from network_builder import build_network, set_co2_limit
+from solve_network import SOLVER_PREFERENCE, pick_solver, solver_options
+
+EXAMPLES = {'single-node': dict(countries='ESP'),
+            'DNK-NOR-SWE': dict(countries=['DNK', 'NOR', 'SWE'],
+                                h2_storage=True, co2_limit=0)}
+
+RESULTS_FILE = 'results/solver_benchmark.csv'
+
+
+def run_case(example, solver_name, mode, threads=None):
+    """Build and solve one example, return the times in seconds, the peak
+    memory of the process in MB and the objective"""
+
+    settings = dict(EXAMPLES[example])
+    co2_limit = settings.pop('co2_limit', None)
+
+    start = time.perf_counter()
+    network = build_network(**settings)
+    if co2_limit is not None:
+        set_co2_limit(network, co2_limit)
+    built = time.perf_counter()
+    network.optimize.create_model()
+    created = time.perf_counter()
+    status, condition = network.optimize.solve_model(
+        solver_name=solver_name,
+        solver_options=solver_options(solver_name, mode, threads))
+    solved = time.perf_counter()
+
+    return {'example': example,
+            'solver': solver_name,
+            'mode': mode,
+            'status': status,
+            'condition': condition,
+            'objective': network.objective,
+            'build_time': built - start,
+            'model_time': created - built,
+            'solve_time': solved - created,
+            'peak_memory': resource.getrusage(
+                resource.RUSAGE_SELF).ru_maxrss/1024}
+
+
+def benchmark(examples=None, solvers=None, modes=('default', 'screening'),
+              threads=None):
+    """Run every combination of example, solver and mode, one process for
+    each run so that the peak memory is measured separately"""
+
+    if examples is None:
+        examples = list(EXAMPLES)
+    if solvers is None:
+        solvers = [s for s in SOLVER_PREFERENCE
+                   if s in linopy.available_solvers]
+    solvers = [pick_solver(s) for s in solvers]
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for example in examples:
+        for solver_name in solvers:
+            for mode in modes:
+                with ProcessPoolExecutor(1, mp_context=context) as executor:
+                    results.append(executor.submit(run_case, example,
+                                                   solver_name, mode,
+                                                   threads).result())
+    return pd.DataFrame(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--examples', nargs='+', choices=list(EXAMPLES))
+    parser.add_argument('--solvers', nargs='+')
+    parser.add_argument('--modes', nargs='+',
+                        default=['default', 'screening'])
+    parser.add_argument('--threads', type=int)
+    parser.add_argument('--output', default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    results = benchmark(args.examples, args.solvers, args.modes, args.threads)
+    if os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    results.to_csv(args.output, index=False)
+    print(results.to_string(index=False))
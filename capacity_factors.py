@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Capacity factors for onshore wind and solar PV for every European country.
+
+The capacity factors can be downloaded from the following repositories
+(select 'optimal' for PV and onshore for wind) and saved in data_extra:
+
+https://zenodo.org/record/3253876#.XSiVOEdS8l0
+
+https://zenodo.org/record/2613651#.XSiVOkdS8l0
+
+Every file is parsed once into a float32 matrix (hours x countries) through
+the binary cache in data_cache.py and kept in memory for the rest of the run.
+Slices for any weather year and set of countries are selected by position,
+without formatting the timestamps as strings.
+"""
+
+import functools
+
+import numpy as np
+import pandas as pd
+
+from data_cache import load_timeseries
+from instrumentation import instrumented
+
+CF_FILES = {'onshorewind': 'data_extra/onshore_wind_1979-2017.csv',
+            'solar': 'data_extra/pv_optimal.csv'}
+
+
+@functools.lru_cache(maxsize=None)
+def load_cf(technology):
+    """Capacity factors for all the hours and countries in the file of
+    technology ('onshorewind' or 'solar')"""
+
+    return load_timeseries(CF_FILES[technology], dtype='float32')
+
+
+def weather_year_index(snapshots, year=None):
+    """Return the UTC timestamps in the weather year that correspond to
+    snapshots. If year is None the snapshots themselves are used, otherwise
+    they are shifted so that the first snapshot falls in year (29 February
+    is mapped to 28 February when the weather year is not a leap year)."""
+
+    snapshots = pd.DatetimeIndex(snapshots)
+    if snapshots.tz is None:
+        snapshots = snapshots.tz_localize('UTC')
+    else:
+        snapshots = snapshots.tz_convert('UTC')
+    if year is None or year == snapshots[0].year:
+        return snapshots
+    return snapshots + pd.DateOffset(years=year - snapshots[0].year)
+
+
+@instrumented('cf slicing')
+def get_cf(technology, countries, snapshots=None, year=None):
+    """Capacity factors of technology for countries aligned with snapshots.
+
+    countries can be one country code (e.g. 'ESP'), then a Series is
+    returned, or a list of codes, then a DataFrame (snapshots x countries).
+    If snapshots is None, all the hours in year are returned. If year is
+    given together with snapshots, the weather of that year is used for the
+    snapshots (e.g. 2015 network snapshots with 1990 weather)."""
+
+    df = load_cf(technology)
+    single = isinstance(countries, str)
+    columns = pd.Index([countries] if single else list(countries))
+    missing = columns.difference(df.columns)
+    if len(missing):
+        raise KeyError('no {} capacity factors for {}'.format(technology,
+                                                              list(missing)))
+    if snapshots is None:
+        if year is None:
+            rows = np.arange(len(df.index))
+        else:
+            rows = np.flatnonzero(df.index.year == year)
+        index = df.index[rows]
+    else:
+        rows = df.index.get_indexer(weather_year_index(snapshots, year))
+        if (rows < 0).any():
+            raise ValueError('{} capacity factors not available for {} '
+                             'snapshots, e.g. {}'.format(
+                                 technology, (rows < 0).sum(),
+                                 pd.DatetimeIndex(snapshots)[rows < 0][0]))
+        index = pd.DatetimeIndex(snapshots)
+    values = df.values[np.ix_(rows, df.columns.get_indexer(columns))]
+    cf = pd.DataFrame(values, index=index, columns=columns)
+    return cf[countries] if single else cf
@@ -1,9 +1,16 @@
 # -*- coding: utf-8 -*-
 """
 Crear layout_wind que incluya la capacidad instalada en cada gridcell,
-luego se puede pintar el histograma con 
+luego se puede pintar el histograma con
 data==capacity factor y weigths=layout_wind
 
+Every plant is assigned to the nearest grid cell with a binary search on the
+(sorted) latitudes and longitudes of the cutout and the capacities are added
+to the cells at once. For several commissioning years, capacity_cube returns
+the cumulative capacity (year x lat x lon) built in one pass, e.g.
+
+cube = capacity_cube(plants, latitudes, longitudes, years=[2000, 2010, 2017])
+cube[1] # capacity in kW in every cell at the end of 2010
 """
 
 import pandas as pd
@@ -11,90 +18,87 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.gridspec as gridspec
 
-# using two separators, EOL=\r\n  and ','
-database = pd.read_csv('data/Windfarms_World_20180224.csv', 
-                            sep="\r\n|','", engine='python' )
-
-# correct error in data format in input file
-database['Commissioning date (Format: yyyy or yyyymm)'][26739]='2011/01/01'
-database['Commissioning date (Format: yyyy or yyyymm)'][26740]='2012/11/26'
-database['Commissioning date (Format: yyyy or yyyymm)'][26741]='2014/12/31'
-
-#filter by continent
-database = database.loc[database['Continent'] == 'Europe']
-
-#filter by plants currently in production
-database = database.loc[database['Status'] == 'Production']
-
-technology='onshore'
-
-#filter by technology
-if technology=='onshore':    
-    database = database.loc[database['Offshore - Shore distance (km)'] == 'No']
-if technology=='offshore':
-    database = database.loc[database['Offshore - Shore distance (km)'] != 'No']
-    
-#filter plants whose total power, number of turbines or location is known
-database = database.loc[database['Total power (kW)']   != '#ND']
-database = database.loc[database['Number of turbines'] != '#ND']
-database = database.loc[database['Latitude (WGS84)']   != '#ND']
-database = database.loc[database['Longitude (WGS84)']  != '#ND']
-                                 
-# if the Comissioning date is unknown, it assumes the plant was always there
-database['Commissioning date (Format: yyyy or yyyymm)'] = ['0000' if (x=='#ND')
-       else x for x in database['Commissioning date (Format: yyyy or yyyymm)']]  
-                               
-year=2000
-                     
-#load cutout metadata
-meta=np.load('cutouts/meta_Europe_2017_1_10.npz')
-latitudes = meta['latitudes'][:,0]
-longitudes = meta['longitudes'][0,:]
-
-
-capacity_map = np.zeros((len(latitudes),len(longitudes)))
-     
-# # filter by capacities category
-# # the total power in every plant is divied by the number of turbines to 
-# # estimate turbine's capacity
-# database_capacity = database.loc[(database['Total power (kW)'].astype(np.int)/
-#                     database['Number of turbines'].astype(np.int) >= 
-#                     categories[i]) & (database['Total power (kW)'].astype(np.int)/
-#                     database['Number of turbines'].astype(np.int) 
-#                     < categories[i+1])]
-
-database_capacity=database    
-indices = [x for x in database.index]
-# select only indices with commissioning date earlier or equal to year
-for indice in indices:
-    if int(database_capacity['Commissioning date (Format: yyyy or yyyymm)'][indice][0:4]) > year:
-        indices.remove(indice)
-    
-              
-plant_list_df = pd.DataFrame(
-        index=pd.Series(
-            data= indices,
-            name='index',
-        ),
-        columns=pd.Series(
-            data=['capacity (kW)', 'lat pos', 'lon pos'],
-            name='data',
-        )
-    )
-
-for ind in indices:
-    plant_list_df['capacity (kW)'][ind] = float(database_capacity['Total power (kW)'][ind])
-    error_latitude = np.array([np.abs(float(database_capacity['Latitude (WGS84)'][ind].replace(',','.'))-lat) 
-                               for lat in latitudes])
-    plant_list_df['lat pos'][ind] = error_latitude.argmin()
-    error_longitude = np.array([np.abs(float(database_capacity['Longitude (WGS84)'][ind].replace(',','.'))-lat) 
-                                 for lat in longitudes])
-    plant_list_df['lon pos'][ind] = error_longitude.argmin()
-        
-for u,v,x in zip(plant_list_df['lat pos'], plant_list_df['lon pos'], plant_list_df['capacity (kW)']):
-    capacity_map[u,v] = capacity_map[u,v] + x
-        
-np.save('Europe_'+str(year)+'_thewindpower'+str(year)+'_wind-' +technology+'.npy', capacity_map)
-plt.contour(capacity_map)
+from windfarms_database import load_windfarms
+
+
+def plant_table(plants):
+    """Capacity in kW, latitude, longitude and commissioning year of every
+    plant in the table returned by windfarms_database.load_windfarms"""
+
+    # if the Comissioning date is unknown, it assumes the plant was always there
+    return pd.DataFrame({'capacity': plants['capacity'].values,
+                         'lat': plants['lat'].values,
+                         'lon': plants['lon'].values,
+                         'year': plants['commissioning_year']
+                                       .fillna(0).astype(int).values},
+                        index=plants.index)
+
+
+def nearest_cell(values, grid):
+    """Position in grid (ascending or descending) of the element closest to
+    every value"""
+
+    grid = np.asarray(grid)
+    order = np.argsort(grid, kind='stable')
+    ordered = grid[order]
+    right = np.clip(np.searchsorted(ordered, values), 1, len(ordered) - 1)
+    left = right - 1
+    closer_left = (np.abs(values - ordered[left])
+                   <= np.abs(ordered[right] - values))
+    return order[np.where(closer_left, left, right)]
+
+
+def capacity_layout(plants, latitudes, longitudes):
+    """(lat x lon) array with the capacity of the plants in every cell"""
+
+    capacity_map = np.zeros((len(latitudes), len(longitudes)))
+    np.add.at(capacity_map,
+              (nearest_cell(plants['lat'].values, latitudes),
+               nearest_cell(plants['lon'].values, longitudes)),
+              plants['capacity'].values)
+    return capacity_map
+
+
+def capacity_cube(plants, latitudes, longitudes, years):
+    """(year x lat x lon) array with the capacity in every cell of the plants
+    commissioned up to every year in years (ascending)"""
+
+    years = np.asarray(years)
+    # first year in which every plant is counted
+    first = np.searchsorted(years, plants['year'].values)
+    built = first < len(years)
+    cube = np.zeros((len(years), len(latitudes), len(longitudes)))
+    np.add.at(cube,
+              (first[built],
+               nearest_cell(plants['lat'].values[built], latitudes),
+               nearest_cell(plants['lon'].values[built], longitudes)),
+              plants['capacity'].values[built])
+    return cube.cumsum(axis=0)
+
+
+if __name__ == '__main__':
+    technology='onshore'
+    years=[2000]
+
+    # plants in production in Europe whose total power, number of turbines
+    # and location are known, see windfarms_database.py
+    database = load_windfarms(continent='Europe', status='Production',
+                              technology=technology, year=max(years))
+    plants = plant_table(database)
+
+    #load cutout metadata
+    meta=np.load('cutouts/meta_Europe_2017_1_10.npz')
+    latitudes = meta['latitudes'][:,0]
+    longitudes = meta['longitudes'][0,:]
 
+    # # filter by capacities category
+    # # the total power in every plant is divied by the number of turbines to
+    # # estimate turbine's capacity
+    # plants = plants.loc[(database['capacity']/database['turbines'] >=
+    #                     categories[i]) & (database['capacity']/
+    #                     database['turbines'] < categories[i+1])]
 
+    cube = capacity_cube(plants, latitudes, longitudes, years)
+    for year, capacity_map in zip(years, cube):
+        np.save('Europe_'+str(year)+'_thewindpower'+str(year)+'_wind-' +technology+'.npy', capacity_map)
+    plt.contour(cube[-1])
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Cost and potential of the carbon dioxide removal (CDR) technologies in the
+PyPSA-Eur networks of the CDR scenarios (see
+CDRs/plotting_CDR_cost_potential.ipynb).
+
+The stores, links and loads of every network are grouped by carrier once
+(carrier_table) and the removal potential and marginal cost of every
+technology, and the emissions used as reference lines in the plot, are
+computed from the grouped table for an explicit list of carriers (e.g. 'EW'
+for enhanced rock weathering). The cost of a technology without components
+in the network is NaN. For a list of scenarios the networks are read in
+parallel processes and only the attributes needed, e.g.
+
+python cdr_summary.py results/CDRs/*.nc --output results/CDRs/cdr_summary.csv
+
+summary = cdr_dataset(glob.glob('results/CDRs/*.nc'))
+plot_cost_potential(summary[summary.file == summary.file.iloc[0]])
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from network_io import read_network
+from results_catalog import parse_scenario
+
+TABLES = ['stores.carrier', 'stores.e_nom_opt', 'stores.capital_cost',
+          'links.carrier', 'links.marginal_cost', 'links.efficiency',
+          'loads.carrier', 'loads.p_set']
+
+# technology: (carriers, component and attribute of the cost), the potential
+# is the energy capacity in tCO2 of the stores of the carriers
+CDR_TECHNOLOGIES = {
+    'afforestation': (['afforestation'], 'stores', 'capital_cost'),
+    'biochar': (['biochar'], 'links', 'marginal_cost'),
+    'enhanced rock weathering': (['EW'], 'links', 'marginal_cost'),
+    'perennialization': (['perennial'], 'links', 'marginal_cost'),
+}
+
+# the cost of these technologies is given per MWh of input
+COST_PER_EFFICIENCY = ['enhanced rock weathering']
+
+UNDERGROUND_SEQUESTRATION = {'potential': 200, 'cost': 10} # MtCO2/a, €/tCO2
+
+# emissions: (carriers of the loads, tCO2 per MWh), None for loads given in
+# tCO2
+EMISSIONS = {
+    'unavoidable process emissions': (['process emissions'], None),
+    'fossil emissions aviation and agriculture': (
+        ['agriculture machinery oil', 'shipping oil', 'land transport oil',
+         'kerosene for aviation'], 0.2572),
+    'fossil emissions shipping': (['shipping methanol', 'industry methanol'],
+                                  0.2178),
+}
+
+
+def carrier_table(network):
+    """Sum and number of the attributes of stores, links and loads by
+    carrier, with columns (component, attribute)"""
+
+    tables = {}
+    for list_name in ['stores', 'links', 'loads']:
+        static = getattr(network, list_name)
+        grouped = static.drop(columns='carrier').groupby(static.carrier)
+        tables[list_name] = grouped.sum().join(grouped.size().rename('count'))
+    return pd.concat(tables, axis=1)
+
+
+def _mean(table, list_name, attr, carriers):
+    """Mean of attr over the components of the carriers, NaN if there are
+    none"""
+
+    rows = table.loc[table.index.isin(carriers), list_name]
+    count = rows['count'].sum()
+    return rows[attr].sum()/count if count else float('nan')
+
+
+def cdr_summary(network):
+    """Potential in MtCO2/a and marginal cost in €/tCO2 of every CDR
+    technology and emissions in MtCO2/a (as potential) of the reference
+    lines"""
+
+    table = carrier_table(network)
+    rows = {'underground sequestration': dict(UNDERGROUND_SEQUESTRATION,
+                                              kind='removal')}
+    for technology, (carriers, list_name, attr) in CDR_TECHNOLOGIES.items():
+        cost = _mean(table, list_name, attr, carriers)
+        if technology in COST_PER_EFFICIENCY:
+            cost /= -_mean(table, 'links', 'efficiency', carriers)
+        stores = table.loc[table.index.isin(carriers), 'stores']
+        rows[technology] = {'kind': 'removal',
+                            'potential': stores['e_nom_opt'].sum()/1e6,
+                            'cost': cost}
+    for name, (carriers, factor) in EMISSIONS.items():
+        # annual energy (or tCO2) of the loads
+        loads = table.loc[table.index.isin(carriers), 'loads']
+        annual = loads['p_set'].sum()*8760/1e6
+        emissions = -annual if factor is None else factor*annual
+        rows[name] = {'kind': 'emissions', 'potential': emissions}
+    summary = pd.DataFrame.from_dict(rows, orient='index')
+    return summary.rename_axis('technology')[['kind', 'potential', 'cost']]
+
+
+def summarize_file(path):
+    """cdr_summary of the network in path with the scenario parameters"""
+
+    summary = cdr_summary(read_network(path, TABLES)).reset_index()
+    summary.insert(0, 'file', os.path.basename(path))
+    for key, value in parse_scenario(path).items():
+        summary[key] = value
+    return summary
+
+
+def cdr_dataset(paths, processes=None):
+    """cdr_summary of every network in paths, read in parallel processes"""
+
+    with ProcessPoolExecutor(processes) as executor:
+        summaries = list(executor.map(summarize_file, paths))
+    return pd.concat(summaries, ignore_index=True)
+
+
+def plot_cost_potential(summary, ax=None):
+    """Cost-potential plot of the CDR technologies of one scenario, with the
+    emissions as vertical lines"""
+
+    import matplotlib.pyplot as plt
+
+    if ax is None:
+        fig, ax = plt.subplots(figsize=(8, 5))
+    summary = summary.set_index('technology')
+    removal = summary[summary.kind == 'removal']
+    colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd']
+    for (label, values), color in zip(removal.iterrows(), colors):
+        ax.scatter(values.potential, values.cost, s=150, alpha=0.7,
+                   color=color, label=label, edgecolors='black',
+                   linewidth=1.5)
+    for label, values in summary[summary.kind == 'emissions'].iterrows():
+        ax.axvline(x=values.potential, color='gray', linestyle='--',
+                   linewidth=2, alpha=0.7)
+        ax.text(values.potential, ax.get_ylim()[1]*0.95, label, rotation=90,
+                verticalalignment='top', horizontalalignment='right',
+                fontsize=14, color='gray')
+    ax.set_xlabel("Potential carbon removal (MtCO2/a)", fontsize=12)
+    ax.set_ylabel("Marginal cost (EUR/tCO2)", fontsize=12)
+    ax.legend(loc="best", fontsize=12, framealpha=0.9)
+    ax.grid(True, alpha=0.3)
+    return ax
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('networks', nargs='+')
+    parser.add_argument('--output', default='results/CDRs/cdr_summary.csv')
+    parser.add_argument('--processes', type=int)
+    args = parser.parse_args()
+
+    dataset = cdr_dataset(args.networks, args.processes)
+    if os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    dataset.to_csv(args.output, index=False)
+    print(dataset)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Sensitivity of the optimal capacity mix to the global CO2 constraint
+(Task B in MESM_project.py).
+
+The network is built once and the CO2 limits are solved in parallel worker
+processes. The limits are sorted and every worker solves a block of
+neighbouring limits on one linear model, changing only the CO2 limit and
+starting each solve from the basis of the previous one when the solver can
+read a basis file (see model_updates.py). The results are collected in one
+tidy table with a row per (co2_limit, quantity, name), e.g.
+
+from network_builder import build_network
+from co2_sweep import co2_sweep
+
+network = build_network('ESP')
+results = co2_sweep(network, [40e6, 20e6, 10e6, 4e6, 1e6])
+results.pivot_table(index='co2_limit', columns='name', values='value')
+"""
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from model_updates import create_model, resolve, set_model_co2_limit
+
+
+def collect_results(network):
+    """Objective, optimal capacities, generation mix and CO2 price of a
+    solved network as (quantity, name, value) records"""
+
+    records = [('objective', 'objective', network.objective)]
+    capacities = [network.generators.p_nom_opt,
+                  network.storage_units.p_nom_opt,
+                  network.links.p_nom_opt,
+                  network.stores.e_nom_opt]
+    for capacity in capacities:
+        records += [('p_nom_opt', name, value)
+                    for name, value in capacity.items()]
+    weightings = network.snapshot_weightings.generators
+    generation = network.generators_t.p.mul(weightings, axis=0).sum()
+    records += [('generation', name, value)
+                for name, value in generation.items()]
+    records += [('co2_price', name, -value)
+                for name, value in network.global_constraints.mu.items()]
+    return records
+
+
+def _solve_block(network, co2_limits, solver_name, mode, threads, options):
+    """Solve network for every limit in co2_limits, the model is built once
+    and every solve starts from the basis of the previous one"""
+
+    rows = []
+    create_model(network, co2_limits[0])
+    with tempfile.TemporaryDirectory() as tmpdir:
+        basis_fn = os.path.join(tmpdir, 'basis.bas')
+        for co2_limit in co2_limits:
+            set_model_co2_limit(network, co2_limit)
+            status, condition = resolve(network, solver_name, mode, threads,
+                                        options, basis_fn=basis_fn)
+            if status != 'ok':
+                rows.append((co2_limit, 'status', condition, np.nan))
+                continue
+            rows += [(co2_limit,) + record
+                     for record in collect_results(network)]
+    return rows
+
+
+def co2_sweep(network, co2_limits, solver_name=None, mode='simplex',
+              options=None, processes=None):
+    """Solve network for every CO2 limit (in tonCO2) in parallel and return
+    a DataFrame with columns co2_limit, quantity, name and value.
+
+    solver_name, mode and options are passed to solve_network, the simplex
+    mode profits most from the warm starts. processes is the number of worker
+    processes (by default the number of cores, at most one per CO2 limit),
+    the cores are shared among the workers."""
+
+    co2_limits = sorted(co2_limits, reverse=True)
+    if processes is None:
+        processes = os.cpu_count()
+    processes = max(1, min(processes, len(co2_limits)))
+    # contiguous blocks, so that every solve starts close to the previous one
+    blocks = [list(block) for block in np.array_split(co2_limits, processes)]
+    threads = max(1, os.cpu_count()//processes)
+
+    if processes == 1:
+        rows = _solve_block(network.copy(), blocks[0], solver_name, mode,
+                            threads, options)
+    else:
+        rows = []
+        with ProcessPoolExecutor(processes) as executor:
+            futures = [executor.submit(_solve_block, network, block,
+                                       solver_name, mode, threads, options)
+                       for block in blocks]
+            for future in futures:
+                rows += future.result()
+
+    return pd.DataFrame(rows, columns=['co2_limit', 'quantity', 'name',
+                                       'value'])
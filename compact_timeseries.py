@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Compact storage of the time series of large networks (e.g. the PyPSA-Eur
+networks with 37 nodes loaded in check_total_system_cost.py and
+check_transport_constraint_Sina.py).
+
+compact(network) converts every time series (inputs such as p_max_pu and
+p_set and results such as p, e and marginal_price) to float32 and returns the
+memory saved per component and attribute. The time series of the networks
+read with network_io.read_network are stored as sparse float32 when most of
+the values are zero (e.g. the dispatch of the links of every build year);
+PyPSA networks are kept dense, because the post-processing of PyPSA (e.g.
+n.statistics) does not work with sparse time series.
+
+The solvers need float64, so solve_compact converts the time series back to
+float64 dense only while the network is solved and compacts the inputs and
+results again afterwards, e.g.
+
+n = pypsa.Network("elec_s_37_lv1.0__3H-T-H-B-I-A-solar+p3-dist1-cb25.7ex0_2050.nc")
+print(compact(n))
+"""
+
+import numpy as np
+import pandas as pd
+
+from solve_network import solve_network
+
+# share of zeros above which a time series is stored as sparse
+SPARSE_THRESHOLD = 0.9
+
+
+def _series_tables(network):
+    """(list_name, attr, df, container) for every time series table of a
+    PyPSA network or of a network read with network_io.read_network"""
+
+    if hasattr(network, 'iterate_components'):
+        for c in network.iterate_components():
+            for attr, df in c.pnl.items():
+                yield c.list_name, attr, df, c.pnl
+    else:
+        for name, series in vars(network).items():
+            if name.endswith('_t'):
+                for attr, df in vars(series).items():
+                    yield name[:-len('_t')], attr, df, vars(series)
+
+
+def memory_usage(network):
+    """Memory in bytes of the time series of every component and attribute"""
+
+    return pd.Series({(list_name, attr): df.memory_usage(index=False).sum()
+                      for list_name, attr, df, _ in _series_tables(network)},
+                     dtype=float).rename_axis(['component', 'attr'])
+
+
+def compact_frame(df, sparse_threshold=SPARSE_THRESHOLD):
+    """df as float32, sparse if the share of zeros is above sparse_threshold
+    (never if sparse_threshold is None)"""
+
+    if df.empty:
+        return df
+    values = df.to_numpy(dtype='float32', na_value=np.nan)
+    if (sparse_threshold is not None
+            and (values == 0).mean() > sparse_threshold):
+        dtype = pd.SparseDtype('float32', 0.)
+    else:
+        dtype = 'float32'
+    return pd.DataFrame(values, index=df.index, columns=df.columns).astype(
+        dtype)
+
+
+def compact(network, sparse_threshold=SPARSE_THRESHOLD):
+    """Convert the time series of network to float32 (sparse if mostly zero,
+    only for networks read with network_io.read_network) and return the
+    memory in bytes before and after for every component and attribute"""
+
+    if hasattr(network, 'iterate_components'):
+        sparse_threshold = None
+    before = memory_usage(network)
+    for list_name, attr, df, container in list(_series_tables(network)):
+        container[attr] = compact_frame(df, sparse_threshold)
+    after = memory_usage(network)
+    report = pd.DataFrame({'before': before, 'after': after})
+    report['saved'] = report.before - report.after
+    return report[report.before > 0]
+
+
+def upcast(network):
+    """Convert the time series of network back to float64 dense"""
+
+    for list_name, attr, df, container in list(_series_tables(network)):
+        if df.empty:
+            continue
+        container[attr] = pd.DataFrame(
+            df.to_numpy(dtype='float64', na_value=np.nan),
+            index=df.index, columns=df.columns)
+
+
+def is_compact(network):
+    """Check if any time series of network is stored as float32 or sparse"""
+
+    return any((df.dtypes != 'float64').any()
+               for _, _, df, _ in _series_tables(network) if not df.empty)
+
+
+def solve_compact(network, *args, **kwargs):
+    """solve_network with the time series in float64 during the solve only,
+    the inputs and results are compacted again at the end"""
+
+    upcast(network)
+    try:
+        return solve_network(network, *args, **kwargs)
+    finally:
+        compact(network)
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Reconciliation of the total system cost of many solved networks, see
+check_total_system_cost.py for the single-network version.
+
+For every file the total system cost is calculated in three ways:
+
+Option A : electricity price weighted by the served load
+Option B : objective function
+Option C : objective function + hydro FOM cost + transmission cost
+
+and the difference A - C is compared with the CO2 cost of gas and the
+revenues of hydro, PHS and run-of-river minus the hydro FOM cost. The
+residual of the comparison should be close to zero.
+
+Only the tables needed by the checks are read from the files (see
+network_io.py) and the files are processed in parallel. A file that cannot be
+read has its error in the column 'error' and no costs, e.g.
+
+python cost_reconciliation.py results/networks --output results/costs.csv
+"""
+
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from market_value import market_values
+from network_builder import annuity
+from network_io import read_network
+
+TABLES = ['buses.carrier', 'buses_t.marginal_price', 'loads.bus',
+          'loads_t.p', 'links.p_nom_opt', 'links.length',
+          'generators.bus', 'generators.carrier', 'generators.p_nom',
+          'generators_t.p', 'storage_units.bus', 'storage_units.carrier',
+          'storage_units.p_nom', 'storage_units_t.p', 'stores.e_nom_opt']
+
+CO2_PRICE = 60 # in €/tCO2
+
+COLUMNS = ['file', 'system_cost_a', 'system_cost_b', 'system_cost_c',
+           'hydro_FOM_cost', 'transmission_cost', 'transmission_capacity',
+           'revenues_hydro', 'revenues_PHS', 'revenues_ror', 'co2_cost',
+           'residual', 'error']
+
+
+def transmission_links(network):
+    """Names of the links between countries, e.g. 'DE-FR'"""
+
+    return network.links.index[network.links.index.str.len() == 5]
+
+
+def system_cost_a(network):
+    """Total system cost in G€ from the electricity price weighted by the
+    served load (Option A)"""
+
+    ac_buses = network.buses.index[network.buses.carrier == 'AC']
+    loads = network.loads_t.p.reindex(columns=ac_buses, fill_value=0.)
+    prices = network.buses_t.marginal_price[ac_buses]
+    w = network.snapshot_weightings.objective.values
+    return (w @ (loads.values*prices.values)).sum()/1e9
+
+
+def hydro_FOM_cost(network):
+    """Hydro cost in G€, not in the objective because hydro_capital_cost=0 in
+    options.yml"""
+
+    su = network.storage_units
+    generators = network.generators
+    return (0.01*2e6*su.p_nom[su.carrier == 'PHS'].sum() #1% FOM ; 2000€/kWh
+            + 0.01*2e6*su.p_nom[su.carrier == 'hydro'].sum() #1% FOM ; 2000€/kWh
+            + 0.02*3e6*generators.p_nom[generators.carrier == 'ror'].sum() #2% FOM ; 3000€/kWh
+            )/1e9
+
+
+def transmission_cost(network):
+    """Transmission cost in G€, not in the objective because
+    CAP_transmission=2*today's"""
+
+    # 1.25 because lines are not straight, 400 is per MWkm of line, 150000 is
+    # per MW cost of converter pair for DC line,
+    # lifetime =40 years, discount rate=7%
+    # n-1 security is approximated by an overcapacity factor 1.5 ~ 1./0.666667
+    #FOM of 2%/a
+    links = network.links.loc[transmission_links(network)]
+    return (((400*1.25*links.length + 150000.)*links.p_nom_opt).sum()
+            *1.5*(annuity(40., 0.07) + 0.02)/1e9)
+
+
+def co2_cost(network, co2_price=CO2_PRICE):
+    """Cost in G€ of the CO2 emitted by gas"""
+
+    stores = network.stores
+    return co2_price/1e9*stores.e_nom_opt[
+        stores.index.str[-9:] == 'gas Store'].sum()
+
+
+def reconcile(network, co2_price=CO2_PRICE):
+    """Dictionary with the three total system costs, the terms explaining
+    their difference and the residual, all in G€"""
+
+    revenues = market_values(network, components=('Generator', 'StorageUnit'))
+    revenue = revenues.groupby(['component', 'carrier']).revenue.sum()/1e9
+
+    row = {'system_cost_a': system_cost_a(network),
+           'system_cost_b': network.objective/1e9,
+           'hydro_FOM_cost': hydro_FOM_cost(network),
+           'transmission_cost': transmission_cost(network),
+           'transmission_capacity': network.links.p_nom_opt[
+               transmission_links(network)].sum(),
+           'revenues_hydro': revenue.get(('StorageUnit', 'hydro'), 0.),
+           'revenues_PHS': revenue.get(('StorageUnit', 'PHS'), 0.),
+           'revenues_ror': revenue.get(('Generator', 'ror'), 0.),
+           'co2_cost': co2_cost(network, co2_price)}
+    row['system_cost_c'] = (row['system_cost_b'] + row['hydro_FOM_cost']
+                            + row['transmission_cost'])
+    row['residual'] = ((row['system_cost_a'] - row['system_cost_c'])
+                       - (row['co2_cost'] + row['revenues_hydro']
+                          + row['revenues_PHS'] + row['revenues_ror']
+                          - row['hydro_FOM_cost']))
+    return row
+
+
+def reconcile_file(path, co2_price=CO2_PRICE):
+    """Reconciliation row of the network saved in path"""
+
+    row = reconcile(read_network(path, TABLES), co2_price)
+    row['file'] = os.path.basename(path)
+    return row
+
+
+def _reconcile_or_error(path, co2_price=CO2_PRICE):
+    """reconcile_file, or a row with the error if the file cannot be read"""
+
+    try:
+        return reconcile_file(path, co2_price)
+    except Exception as error:
+        return {'file': os.path.basename(path), 'error': repr(error)}
+
+
+def network_files(directory, patterns=('*.h5', '*.nc')):
+    """Solved networks in directory"""
+
+    return sorted(f for pattern in patterns
+                  for f in glob.glob(os.path.join(directory, pattern)))
+
+
+def reconcile_directory(directory, co2_price=CO2_PRICE, processes=None,
+                        path=None):
+    """Reconciliation table with one row per network in directory, written to
+    path if given. The files that fail have the error in the column
+    'error'."""
+
+    files = network_files(directory)
+    with ProcessPoolExecutor(processes) as executor:
+        rows = list(executor.map(_reconcile_or_error, files,
+                                 [co2_price]*len(files)))
+    table = pd.DataFrame(rows, columns=COLUMNS)
+    if path is not None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        table.to_csv(path, index=False)
+    return table
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('directory')
+    parser.add_argument('--co2-price', type=float, default=CO2_PRICE)
+    parser.add_argument('--processes', type=int)
+    parser.add_argument('--output', default='results/cost_reconciliation.csv')
+    args = parser.parse_args()
+
+    table = reconcile_directory(args.directory, args.co2_price,
+                                args.processes, args.output)
+    print(table.to_string(index=False))
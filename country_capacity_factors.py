@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Aggregated wind and solar PV capacity factors of every European country in
+the model, see proportional_capacity_layout.py for the single-country version.
+
+One cutout covering Europe is prepared and the hourly capacity factors of all
+its cells are converted once (see atlite_conversion.py). The share of every
+cell inside every country (countries x cells, sparse) is computed once from
+the Natural Earth shapes with cutout.indicatormatrix. Within every country
+the capacity is distributed proportionally to the mean capacity factor of
+the cells to the power cf_exponent, and the aggregated time series of all
+the countries are obtained at once as a product of the (time x cells)
+capacity factors and the (cells x countries) layout weights.
+
+The result is written in the format of data_extra/onshore_wind_1979-2017.csv
+(';' separated, 'utc_time' index and one column per ISO3 country code) or as
+parquet if the output ends with .parquet, e.g.
+
+python country_capacity_factors.py --time 2015 --technology wind \
+    --output data_extra/onshore_wind_2015.csv
+"""
+
+import argparse
+import os
+
+import atlite
+import cartopy.io.shapereader as shpreader
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from atlite_conversion import (TIME_CHUNK, capacity_factor_timeseries,
+                               mean_capacity_factor)
+from data_cache import load_demand
+
+# x0, y0, x1, y1 of the Europe cutout
+EUROPE_BOUNDS = (-12., 33., 42., 72.)
+
+TECHNOLOGIES = {'wind': dict(turbine="Vestas_V112_3MW"),
+                'pv': dict(panel="CSi",
+                           orientation={"slope": 30.0, "azimuth": 180.0})}
+
+
+def model_countries():
+    """ISO3 codes of the countries in the model (columns of the demand)"""
+
+    return list(load_demand().columns)
+
+
+def country_shapes(countries):
+    """Natural Earth shapes of the countries, indexed by ISO3 code"""
+
+    shpfilename = shpreader.natural_earth(resolution="10m",
+                                          category="cultural",
+                                          name="admin_0_countries")
+    reader = shpreader.Reader(shpfilename)
+    shapes = gpd.GeoSeries({r.attributes["ADM0_A3"]: r.geometry
+                            for r in reader.records()}, crs="EPSG:4326")
+    missing = pd.Index(countries).difference(shapes.index)
+    if len(missing):
+        raise KeyError('no shape for countries {}'.format(list(missing)))
+    return shapes.reindex(countries)
+
+
+def europe_cutout(time, path=None, bounds=EUROPE_BOUNDS):
+    """Prepared ERA5 cutout covering Europe for time (e.g. '2015')"""
+
+    if path is None:
+        path = 'cutouts/europe-{}.nc'.format(time)
+    cutout = atlite.Cutout(path=path, module="era5", bounds=bounds, time=time)
+    cutout.prepare()
+    return cutout
+
+
+def country_indicators(cutout, shapes):
+    """(countries x cells) sparse matrix with the share of every cell inside
+    every country, the cells in the order of cutout.grid"""
+
+    return sp.csr_matrix(cutout.indicatormatrix(shapes))
+
+
+def layout_weights(cf, indicators, cf_exponent=2):
+    """(cells x countries) sparse matrix with the capacity in every cell
+    proportional to its mean capacity factor to the power cf_exponent,
+    normalized so that the capacity in every country sums to one"""
+
+    # the cells in the same order as in the indicator matrix and in
+    # aggregated_cf
+    layout = mean_capacity_factor(cf).transpose('y', 'x').values.ravel()
+    layout = layout**cf_exponent
+    weights = indicators.multiply(layout[np.newaxis, :]).tocsr()
+    total = np.asarray(weights.sum(axis=1)).ravel()
+    with np.errstate(divide='ignore'):
+        weights = sp.diags(np.where(total > 0, 1/total, 0.)) @ weights
+    return weights.T.tocsr()
+
+
+def aggregated_cf(cf, weights, countries):
+    """(time x countries) capacity factors from the (time x y x x) capacity
+    factors of the cells, one time chunk in memory at a time"""
+
+    n_times = cf.sizes['time']
+    values = np.empty((n_times, len(countries)), dtype='float32')
+    for start in range(0, n_times, TIME_CHUNK):
+        chunk = cf.isel(time=slice(start, start + TIME_CHUNK))
+        chunk = chunk.transpose('time', 'y', 'x').values
+        values[start:start + len(chunk)] = (
+            weights.T @ chunk.reshape(len(chunk), -1).T).T
+    index = pd.DatetimeIndex(cf['time'].values, name='utc_time')
+    return pd.DataFrame(values, index=index.tz_localize('UTC'),
+                        columns=countries)
+
+
+def country_capacity_factors(cutout, technology, countries=None,
+                             cf_exponent=2, indicators=None):
+    """(time x countries) aggregated capacity factors of technology ('wind' or
+    'pv'). indicators (see country_indicators) can be given to reuse them for
+    several technologies."""
+
+    if countries is None:
+        countries = model_countries()
+    if indicators is None:
+        indicators = country_indicators(cutout, country_shapes(countries))
+    cf = capacity_factor_timeseries(cutout, technology,
+                                    **TECHNOLOGIES[technology])
+    weights = layout_weights(cf, indicators, cf_exponent)
+    return aggregated_cf(cf, weights, countries)
+
+
+def write_cf_file(df, path):
+    """Save the capacity factors as parquet or in the ';' separated format of
+    the files in data_extra"""
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    if path.endswith('.parquet'):
+        df.to_parquet(path)
+        return
+    df = df.copy()
+    df.index = df.index.strftime('%Y-%m-%dT%H:%M:%SZ')
+    df.index.name = 'utc_time'
+    df.to_csv(path, sep=';', float_format='%.3f')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--time', required=True)
+    parser.add_argument('--technology', nargs='+', default=['wind', 'pv'],
+                        choices=list(TECHNOLOGIES))
+    parser.add_argument('--countries', nargs='+')
+    parser.add_argument('--cf-exponent', type=float, default=2)
+    parser.add_argument('--cutout')
+    parser.add_argument('--output', nargs='+', required=True,
+                        help='one file per technology')
+    args = parser.parse_args()
+
+    countries = args.countries or model_countries()
+    cutout = europe_cutout(args.time, args.cutout)
+    indicators = country_indicators(cutout, country_shapes(countries))
+    for technology, output in zip(args.technology, args.output):
+        write_cf_file(country_capacity_factors(cutout, technology, countries,
+                                               args.cf_exponent, indicators),
+                      output)
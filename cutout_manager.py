@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Preparation of atlite cutouts over long periods, one month at a time.
+
+The requested period is split into monthly cutouts (e.g.
+'cutouts/europe-2015-01.nc') that are prepared in parallel processes. A
+'.done' file is written next to every cutout once it is prepared, so an
+interrupted run only prepares the missing months when it is started again.
+
+The computing nodes have no network, so the ERA5 data is read from a local
+mirror instead of the Climate Data Store. The mirror has one netCDF file per
+ERA5 variable and month as downloaded from the CDS (single levels, hourly):
+
+{mirror}/{year}/{variable}_{year}-{month}.nc  e.g.
+era5/2015/100m_u_component_of_wind_2015-01.nc
+
+The whole period is opened lazily as one dataset with open_period, e.g.
+
+prepare_period('europe', '2015-01', '2017-12', bounds=EUROPE_BOUNDS,
+               mirror='/data/era5', processes=12)
+cutout = period_cutout('europe', '2015-01', '2017-12')
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+CUTOUT_DIR = 'cutouts'
+
+ERA5_MIRROR = os.environ.get('ERA5_MIRROR', 'era5')
+
+
+def monthly_chunks(start, end):
+    """Months between start and end (both included) as 'yyyy-mm'"""
+
+    return [str(p) for p in pd.period_range(start, end, freq='M')]
+
+
+def chunk_path(name, month, directory=CUTOUT_DIR):
+    """Cutout file of one month"""
+
+    return os.path.join(directory, '{}-{}.nc'.format(name, month))
+
+
+def is_done(path):
+    """Check if the cutout in path was prepared completely"""
+
+    return os.path.exists(path) and os.path.exists(path + '.done')
+
+
+def _as_list(value):
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def mirror_retrieve_data(mirror=ERA5_MIRROR):
+    """Replacement for atlite.datasets.era5.retrieve_data reading the
+    requested variables, months and area from the local mirror"""
+
+    def retrieve_data(product, chunks=None, tmpdir=None, lock=None,
+                      **updates):
+        if product != 'reanalysis-era5-single-levels':
+            raise ValueError('only {} is in the ERA5 mirror, not {}'.format(
+                'reanalysis-era5-single-levels', product))
+        files = ['{}/{}/{}_{}-{:02d}.nc'.format(mirror, year, variable,
+                                                year, int(month))
+                 for variable in _as_list(updates['variable'])
+                 for year in _as_list(updates['year'])
+                 for month in _as_list(updates['month'])]
+        missing = [f for f in files if not os.path.exists(f)]
+        if missing:
+            raise FileNotFoundError('files not in the ERA5 mirror: {}'
+                                    .format(missing))
+        ds = xr.open_mfdataset(files, chunks=chunks, combine='by_coords')
+        # files downloaded from the new CDS name the time 'valid_time'
+        if 'valid_time' in ds.dims:
+            ds = ds.rename(valid_time='time')
+        north, west, south, east = updates['area']
+        ds = ds.sel(latitude=slice(north, south),
+                    longitude=slice(west, east))
+        if 'day' in updates:
+            days = np.array(_as_list(updates['day']), dtype=int)
+            ds = ds.sel(time=ds['time'].dt.day.isin(days))
+        if 'time' in updates:
+            hours = [int(str(t)[:2]) for t in _as_list(updates['time'])]
+            ds = ds.sel(time=ds['time'].dt.hour.isin(hours))
+        return ds
+
+    return retrieve_data
+
+
+def use_mirror(mirror=ERA5_MIRROR):
+    """Make atlite read ERA5 from the local mirror in this process"""
+
+    import atlite.datasets.era5 as era5
+    era5.retrieve_data = mirror_retrieve_data(mirror)
+
+
+def prepare_month(name, month, bounds, directory=CUTOUT_DIR,
+                  mirror=ERA5_MIRROR, **cutout_kwargs):
+    """Prepare the cutout of one month, returns its path"""
+
+    import atlite
+
+    path = chunk_path(name, month, directory)
+    if is_done(path):
+        return path
+    use_mirror(mirror)
+    # an interrupted preparation may have left an incomplete file
+    if os.path.exists(path):
+        os.remove(path)
+    cutout = atlite.Cutout(path=path, module='era5', bounds=bounds,
+                           time=month, **cutout_kwargs)
+    cutout.prepare()
+    with open(path + '.done', 'w') as f:
+        f.write(pd.Timestamp.now().isoformat())
+    return path
+
+
+def prepare_period(name, start, end, bounds, directory=CUTOUT_DIR,
+                   mirror=ERA5_MIRROR, processes=None, **cutout_kwargs):
+    """Prepare the monthly cutouts between start and end in parallel, the
+    months already prepared are skipped. Returns the paths of the cutouts."""
+
+    os.makedirs(directory, exist_ok=True)
+    months = monthly_chunks(start, end)
+    todo = [m for m in months if not is_done(chunk_path(name, m, directory))]
+    if todo:
+        with ProcessPoolExecutor(processes) as executor:
+            futures = {executor.submit(prepare_month, name, month, bounds,
+                                       directory, mirror, **cutout_kwargs):
+                       month for month in todo}
+            for future in as_completed(futures):
+                # raise the first error, the other months are kept
+                future.result()
+    return [chunk_path(name, m, directory) for m in months]
+
+
+def open_period(name, start, end, directory=CUTOUT_DIR, chunks=None):
+    """Monthly cutouts between start and end as one lazy dataset"""
+
+    paths = [chunk_path(name, m, directory)
+             for m in monthly_chunks(start, end)]
+    missing = [p for p in paths if not is_done(p)]
+    if missing:
+        raise FileNotFoundError('cutouts not prepared: {}, run '
+                                'prepare_period first'.format(missing))
+    if chunks is None:
+        chunks = {'time': 100}
+    return xr.open_mfdataset(paths, combine='nested', concat_dim='time',
+                             data_vars='minimal', coords='minimal',
+                             compat='override', combine_attrs='override',
+                             chunks=chunks)
+
+
+def period_cutout(name, start, end, directory=CUTOUT_DIR, chunks=None):
+    """atlite cutout of the whole period, backed by open_period"""
+
+    import atlite
+
+    path = os.path.join(directory, '{}-{}-{}.nc'.format(name, start, end))
+    return atlite.Cutout(path=path, data=open_period(name, start, end,
+                                                     directory, chunks))
+
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Binary cache for the hourly time series stored as csv files in the data folders.
+
+The first time a file is requested it is parsed with pandas and saved in
+'data/cache' as a memory-mapped .npy array (one contiguous column per country),
+the UTC index and the column names. Later calls read the binary files, no
+text is parsed. The cache is rebuilt when the source file changes: the size
+and modification time are checked first and, if only the modification time
+changed, the sha1 hash of the file decides.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import instrumented
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(REPO_DIR, 'data', 'cache')
+
+DEMAND_FILES = {'electricity': 'data/electricity_demand.csv',
+                'heat': 'data/heat_demand.csv'}
+
+
+def file_hash(path):
+    """sha1 hash of the content of a file"""
+
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def stored_file_hash(path):
+    """sha1 hash of a file, computed again only when its size or modification
+    time changed since the last call (the hashes are stored in the cache)"""
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    hashes_path = os.path.join(CACHE_DIR, 'file_hashes.json')
+    hashes = {}
+    if os.path.exists(hashes_path):
+        with open(hashes_path) as f:
+            hashes = json.load(f)
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    stored = hashes.get(path)
+    if (stored is not None and stored['size'] == stat.st_size
+            and stored['mtime_ns'] == stat.st_mtime_ns):
+        return stored['sha1']
+    hashes[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                    'sha1': file_hash(path)}
+    write_json(hashes_path, hashes)
+    return hashes[path]['sha1']
+
+
+def source_fingerprint(path):
+    """Size, modification time and hash identifying the content of a file"""
+
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha1': file_hash(path)}
+
+
+def _cache_files(name):
+    base = os.path.join(CACHE_DIR, name)
+    return {'meta': base + '.json',
+            'values': base + '.values.npy',
+            'index': base + '.index.npy'}
+
+
+def is_fresh(meta_path, path):
+    """Check if the cache described in meta_path was built from the current
+    version of path (one file or a list of files). An unchanged file that was
+    only touched refreshes the stored modification time, so the hash is
+    computed once."""
+
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    paths = [path] if isinstance(path, str) else list(path)
+    sources = meta['source']
+    if isinstance(sources, dict):
+        sources = [sources]
+    if [s['path'] for s in sources] != [os.path.abspath(p) for p in paths]:
+        return False
+    touched = False
+    for source, p in zip(sources, paths):
+        stat = os.stat(p)
+        if source['size'] != stat.st_size:
+            return False
+        if source['mtime_ns'] == stat.st_mtime_ns:
+            continue
+        if source['sha1'] != file_hash(p):
+            return False
+        source['mtime_ns'] = stat.st_mtime_ns
+        touched = True
+    if touched:
+        write_json(meta_path, meta)
+    return True
+
+
+def write_json(path, content):
+    """Write content as JSON to path, through a temporary file so that the
+    runs sharing the cache never read a partial file"""
+
+    tmp = path + '.tmp%d' % os.getpid()
+    with open(tmp, 'w') as f:
+        json.dump(content, f)
+    os.replace(tmp, path)
+
+
+def _save_npy(path, array):
+    # write to a temporary file first, several runs may share the cache
+    tmp = path + '.tmp%d.npy' % os.getpid()
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+
+@instrumented('read csv')
+def read_timeseries_csv(path):
+    """Parse one of the ';' separated csv files with an hourly 'utc_time' index"""
+
+    df = pd.read_csv(path, sep=';', index_col=0)
+    df.index = pd.to_datetime(df.index, format='%Y-%m-%dT%H:%M:%SZ', utc=True)
+    return df
+
+
+def write_cache(name, df, path, dtype='float64'):
+    """Store the DataFrame df, parsed from path (one file or a list of
+    files), in the cache"""
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    files = _cache_files(name)
+    # Fortran order, so that every country is a contiguous block in the file
+    _save_npy(files['values'], np.asfortranarray(df.values, dtype=dtype))
+    index = df.index.tz_convert('UTC').tz_localize(None)
+    _save_npy(files['index'], index.values.astype('datetime64[ns]'))
+    if isinstance(path, str):
+        source = source_fingerprint(path)
+    else:
+        source = [source_fingerprint(p) for p in path]
+    write_json(files['meta'], {'source': source,
+                                'index_name': df.index.name,
+                                'columns': [str(c) for c in df.columns],
+                                'dtype': dtype})
+
+
+def read_cache(name, path, columns=None, mmap=True):
+    """Return the cached DataFrame built from path (one file or a list of
+    files), or None if the cache is missing or outdated. If columns is given,
+    only those columns are read from the memory-mapped file."""
+
+    files = _cache_files(name)
+    if not is_fresh(files['meta'], path):
+        return None
+    with open(files['meta']) as f:
+        meta = json.load(f)
+    values = np.load(files['values'], mmap_mode='r' if mmap else None)
+    index = pd.DatetimeIndex(np.load(files['index'])).tz_localize('UTC')
+    index.name = meta.get('index_name', 'utc_time')
+    all_columns = pd.Index(meta['columns'])
+    if columns is None:
+        columns = all_columns
+    else:
+        columns = pd.Index(columns)
+        missing = columns.difference(all_columns)
+        if len(missing):
+            raise KeyError('columns not in {} cache: {}'.format(name,
+                                                             list(missing)))
+    positions = all_columns.get_indexer(columns)
+    return pd.DataFrame(np.asarray(values[:, positions]),
+                        index=index, columns=columns)
+
+
+@instrumented('load timeseries')
+def load_timeseries(path, name=None, columns=None, dtype='float64'):
+    """Load a ';' separated hourly csv file through the binary cache"""
+
+    if not os.path.isabs(path):
+        path = os.path.join(REPO_DIR, path)
+    if name is None:
+        name = os.path.splitext(os.path.basename(path))[0]
+    df = read_cache(name, path, columns=columns)
+    if df is None:
+        write_cache(name, read_timeseries_csv(path), path, dtype=dtype)
+        df = read_cache(name, path, columns=columns)
+    return df
+
+
+def load_demand(kind='electricity', countries=None):
+    """Hourly demand in MWh for the countries (e.g. ['ESP', 'DNK']),
+    kind is 'electricity' or 'heat'"""
+
+    return load_timeseries(DEMAND_FILES[kind], name=kind + '_demand',
+                           columns=countries)
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Batch rendering of the capacity factor figures of proportional_capacity_layout.py
+for many countries and years.
+
+The figures are rendered without display (Agg backend) in parallel processes.
+The Natural Earth shapes are read once per process and the shapes around every
+country, projected to the orthographic projection centered on it, are saved
+in 'data/cache/geometries', so they are not projected again by cartopy for
+every figure. Every process keeps a template figure per country with the
+borders already drawn: only the data is drawn for every figure and removed
+after saving.
+
+Every figure is described by a dictionary (a job) with its kind and the
+arguments of the plotting function:
+
+'cf_map' : plot_cf_map(country, cf, output, cmap, alpha), cf is the (y x x)
+           map of capacity factors, e.g. mean_capacity_factor in
+           atlite_conversion.py
+'agg_cf' : plot_agg_cf(cf, output, color), cf is the aggregated time series
+
+e.g. the aggregated capacity factors of every country and year in one of the
+files in data_extra:
+
+python figure_pipeline.py data_extra/onshore_wind_1979-2017.csv --years 2015 2016
+"""
+
+import argparse
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+import geopandas as gpd
+
+from data_cache import CACHE_DIR, read_timeseries_csv
+
+FIGURES_DIR = 'figures'
+
+GEOMETRY_CACHE_DIR = os.path.join(CACHE_DIR, 'geometries')
+
+# degrees around the bounds of a country shown in the maps
+MAP_MARGIN = 2.
+
+
+@functools.lru_cache(maxsize=None)
+def natural_earth_shapes():
+    """Natural Earth country shapes indexed by ISO3 code (ADM0_A3)"""
+
+    import cartopy.io.shapereader as shpreader
+
+    shpfilename = shpreader.natural_earth(resolution="10m",
+                                          category="cultural",
+                                          name="admin_0_countries")
+    reader = shpreader.Reader(shpfilename)
+    return gpd.GeoSeries({r.attributes["ADM0_A3"]: r.geometry
+                          for r in reader.records()}, crs="EPSG:4326")
+
+
+def map_bounds(country):
+    """x0, y0, x1, y1 of the map of country, in degrees"""
+
+    x0, y0, x1, y1 = natural_earth_shapes()[country].bounds
+    return (x0 - MAP_MARGIN, y0 - MAP_MARGIN, x1 + MAP_MARGIN,
+            y1 + MAP_MARGIN)
+
+
+def projection(country):
+    """Orthographic projection centered on country"""
+
+    import cartopy.crs as ccrs
+
+    x0, y0, x1, y1 = map_bounds(country)
+    return ccrs.Orthographic((x0 + x1)/2, (y0 + y1)/2)
+
+
+def projected_shapes(country):
+    """Shapes in the map of country in its projection, read from the cache
+    if they were projected before"""
+
+    path = os.path.join(GEOMETRY_CACHE_DIR, country + '.parquet')
+    if os.path.exists(path):
+        return gpd.read_parquet(path).geometry
+    shapes = natural_earth_shapes().clip(map_bounds(country))
+    shapes = shapes[~shapes.is_empty]
+    projected = shapes.to_crs(projection(country).proj4_init)
+    os.makedirs(GEOMETRY_CACHE_DIR, exist_ok=True)
+    tmp = path + '.tmp%d' % os.getpid()
+    gpd.GeoDataFrame(geometry=projected).to_parquet(tmp)
+    os.replace(tmp, path)
+    return projected
+
+
+@functools.lru_cache(maxsize=8)
+def map_template(country, figsize=(11, 4)):
+    """Figure, map axes and colorbar axes of country with the borders drawn.
+    The figures are not created with pyplot, which would keep them open
+    after they are evicted from the cache."""
+
+    from cartopy.crs import PlateCarree as plate
+
+    fig = Figure(figsize=figsize)
+    ax = fig.add_axes([0.02, 0.05, 0.8, 0.9], projection=projection(country))
+    cax = fig.add_axes([0.85, 0.1, 0.02, 0.8])
+    # already projected, no transform needed
+    projected_shapes(country).plot(ax=ax, facecolor="None", edgecolor="k",
+                                   linewidth=0.5, zorder=4)
+    x0, y0, x1, y1 = map_bounds(country)
+    ax.set_extent([x0, x1, y0, y1], crs=plate())
+    ax.spines['geo'].set_edgecolor("white")
+    return fig, ax, cax
+
+
+@functools.lru_cache(maxsize=1)
+def series_template(figsize=(12, 8)):
+    """Figure and axes of the aggregated time series"""
+
+    fig = Figure(figsize=figsize)
+    return fig, fig.subplots(1)
+
+
+def plot_cf_map(country, cf, output, cmap='winter_r', alpha=0.8, dpi=300):
+    """Map of the capacity factors cf (y x x) in country"""
+
+    from cartopy.crs import PlateCarree as plate
+
+    fig, ax, cax = map_template(country)
+    mesh = ax.pcolormesh(cf['x'].values, cf['y'].values, cf.values,
+                         transform=plate(), alpha=alpha, cmap=cmap,
+                         shading='nearest')
+    fig.colorbar(mesh, cax=cax)
+    try:
+        fig.savefig(output, dpi=dpi, bbox_inches='tight')
+    finally:
+        mesh.remove()
+        cax.cla()
+
+
+def plot_agg_cf(cf, output, color=None, dpi=300):
+    """Area plot of the aggregated capacity factors cf (time series)"""
+
+    fig, ax = series_template()
+    cf.plot.area(ax=ax, color=color)
+    ax.text(0.5, 0.9,
+            'mean CF = ' + str(round(cf.values.mean(),2)),
+            fontsize=20,
+            horizontalalignment='center',
+            verticalalignment='center',
+            transform=ax.transAxes)
+    try:
+        fig.savefig(output, dpi=dpi, bbox_inches='tight')
+    finally:
+        ax.cla()
+
+
+PLOTS = {'cf_map': plot_cf_map, 'agg_cf': plot_agg_cf}
+
+
+def render(job):
+    """Render the figure described by job, returns the output file"""
+
+    job = dict(job)
+    kind = job.pop('kind')
+    if os.path.dirname(job['output']):
+        os.makedirs(os.path.dirname(job['output']), exist_ok=True)
+    PLOTS[kind](**job)
+    return job['output']
+
+
+def _template_key(job):
+    return (job['kind'], job.get('country', ''))
+
+
+def render_figures(jobs, processes=None):
+    """Render all the jobs in parallel processes, the jobs using the same
+    template are sent to the same process when possible"""
+
+    jobs = sorted(jobs, key=_template_key)
+    # the shapes are projected once before the processes start
+    for country in {job['country'] for job in jobs if 'country' in job}:
+        projected_shapes(country)
+    if processes is None:
+        processes = os.cpu_count()
+    chunksize = max(1, len(jobs)//(4*processes))
+    with ProcessPoolExecutor(processes) as executor:
+        return list(executor.map(render, jobs, chunksize=chunksize))
+
+
+def agg_cf_jobs(path, years, countries=None, color=None,
+                directory=FIGURES_DIR):
+    """Jobs for the aggregated capacity factors of the countries in the file
+    path (see data_extra) in every year"""
+
+    cf = read_timeseries_csv(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    if countries is None:
+        countries = list(cf.columns)
+    return [{'kind': 'agg_cf',
+             'cf': cf.loc[str(year), country],
+             'output': os.path.join(directory, 'agg_cf_{}_{}_{}.jpg'.format(
+                 name, country, year)),
+             'color': color}
+            for country in countries for year in years]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('path')
+    parser.add_argument('--years', nargs='+', type=int, required=True)
+    parser.add_argument('--countries', nargs='+')
+    parser.add_argument('--color')
+    parser.add_argument('--processes', type=int)
+    parser.add_argument('--directory', default=FIGURES_DIR)
+    args = parser.parse_args()
+
+    jobs = agg_cf_jobs(args.path, args.years, args.countries, args.color,
+                       args.directory)
+    for output in render_figures(jobs, args.processes):
+        print(output)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Hydro inflow for the European countries.
+
+data/inflow includes one file per country (Hydro_Inflow_XX.csv) with the
+daily inflow in GWh for 2003-2012. All the files are merged once into a
+single (day x country) array stored in the binary cache (see data_cache.py).
+Every country is a contiguous block in the memory-mapped file, so only the
+requested countries are read.
+
+The inflow can be converted to hourly MW time series aligned with the
+network snapshots and used as the 'inflow' of hydro StorageUnits, e.g.
+
+network.add("StorageUnit",
+            "hydro",
+            bus="electricity bus",
+            carrier="hydro",
+            p_nom=p_nom_hydro,
+            max_hours=6,
+            inflow=hourly_inflow('ESP', network.snapshots, year=2012))
+"""
+
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_cache import REPO_DIR, read_cache, write_cache
+from capacity_factors import weather_year_index
+
+INFLOW_DIR = os.path.join(REPO_DIR, 'data', 'inflow')
+
+# country codes used in the rest of the data (ISO 3166 alpha-3) and in the
+# names of the inflow files
+INFLOW_CODES = {'AUT': 'AT', 'BIH': 'BA', 'BEL': 'BE', 'BGR': 'BG',
+                'CHE': 'CH', 'CZE': 'CZ', 'DEU': 'DE', 'ESP': 'ES',
+                'FIN': 'FI', 'FRA': 'FR', 'GBR': 'GB', 'GRC': 'GR',
+                'HRV': 'HR', 'HUN': 'HU', 'IRL': 'IE', 'ITA': 'IT',
+                'LTU': 'LT', 'LVA': 'LV', 'MNE': 'ME', 'MKD': 'MK',
+                'NLD': 'NL', 'NOR': 'NO', 'POL': 'PL', 'PRT': 'PT',
+                'ROU': 'RO', 'SRB': 'RS', 'SWE': 'SE', 'SVN': 'SI',
+                'SVK': 'SK'}
+
+
+def inflow_files():
+    """Inflow file for every country code found in data/inflow"""
+
+    paths = sorted(glob.glob(os.path.join(INFLOW_DIR, 'Hydro_Inflow_*.csv')))
+    return {os.path.basename(p)[len('Hydro_Inflow_'):-len('.csv')]: p
+            for p in paths}
+
+
+def read_inflow_files(files):
+    """Parse the daily inflow files and merge them in a (day x country)
+    DataFrame in GWh"""
+
+    columns = {}
+    days = None
+    for code, path in files.items():
+        data = np.loadtxt(path, delimiter=',', skiprows=1)
+        dates = pd.to_datetime(pd.DataFrame({'year': data[:, 0].astype(int),
+                                             'month': data[:, 1].astype(int),
+                                             'day': data[:, 2].astype(int)}),
+                               utc=True)
+        if days is None:
+            days = pd.DatetimeIndex(dates)
+        elif not days.equals(pd.DatetimeIndex(dates)):
+            raise ValueError('the days in {} differ from the rest of the '
+                             'inflow files'.format(path))
+        columns[code] = data[:, 3]
+    df = pd.DataFrame(columns, index=days)
+    df.index.name = 'day'
+    return df
+
+
+def build_inflow_store():
+    """Merge all the inflow files into the binary cache"""
+
+    files = inflow_files()
+    write_cache('hydro_inflow', read_inflow_files(files), list(files.values()))
+
+
+def _inflow_code(country):
+    return INFLOW_CODES.get(country, country)
+
+
+def load_inflow(countries=None):
+    """Daily inflow in GWh for countries, given either as ISO alpha-3 codes
+    (e.g. 'NOR') or as the codes in the file names (e.g. 'NO'). The columns
+    are named as requested."""
+
+    files = list(inflow_files().values())
+    single = isinstance(countries, str)
+    if single:
+        countries = [countries]
+    codes = None if countries is None else [_inflow_code(c) for c in countries]
+    df = read_cache('hydro_inflow', files, columns=codes)
+    if df is None:
+        build_inflow_store()
+        df = read_cache('hydro_inflow', files, columns=codes)
+    if countries is not None:
+        df.columns = pd.Index(countries)
+    return df[countries[0]] if single else df
+
+
+def hourly_inflow(countries, snapshots, year=None):
+    """Inflow in MW for countries aligned with snapshots, to be used as
+    StorageUnit.inflow. The daily energy is spread evenly over the hours of
+    the day. The inflow data covers 2003-2012, so for other snapshots the
+    weather year must be given (e.g. 2015 snapshots with year=2012)."""
+
+    daily = load_inflow(countries)
+    days = weather_year_index(snapshots, year).floor('D')
+    rows = daily.index.get_indexer(days)
+    if (rows < 0).any():
+        raise ValueError('no inflow data for {} snapshots, e.g. {}, the '
+                         'inflow covers {} to {}'.format(
+                             (rows < 0).sum(), days[rows < 0][0],
+                             daily.index[0].date(), daily.index[-1].date()))
+    values = daily.values[rows] * 1000 / 24  # GWh per day -> MW
+    if isinstance(daily, pd.Series):
+        return pd.Series(values, index=pd.DatetimeIndex(snapshots),
+                         name=daily.name)
+    return pd.DataFrame(values, index=pd.DatetimeIndex(snapshots),
+                        columns=daily.columns)
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in timing and memory instrumentation of the phases of a run.
+
+The phases (reading the csv files, slicing the capacity factors, adding the
+components, building the network, creating the linear model, the solver,
+assigning the solution and the post-processing of the market values) are
+recorded only when the environment variable MESM_TRACE is set to a folder,
+e.g.
+
+MESM_TRACE=results/traces python co2_sweep.py ESP
+
+Every process of the run (also the workers of a sweep) writes a trace file in
+that folder with the wall time, CPU time and peak memory (RSS) of every phase,
+in the Chrome trace format, so that it can be opened in chrome://tracing or
+https://ui.perfetto.dev. The traces of a folder are aggregated by phase with
+
+python instrumentation.py results/traces
+
+Other code can be instrumented with the phase context manager or the
+instrumented decorator, e.g.
+
+with phase('plot maps', countries=3):
+    ...
+
+@instrumented('read results')
+def read_results(path):
+    ...
+"""
+
+import argparse
+import contextlib
+import functools
+import glob
+import json
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, where the peak memory is not recorded
+    resource = None
+
+TRACE_VARIABLE = 'MESM_TRACE'
+
+_events = []
+_state = {'pid': None, 'depth': 0, 'start': None}
+
+
+def trace_folder():
+    """Folder of the traces, None if the instrumentation is disabled"""
+
+    return os.environ.get(TRACE_VARIABLE) or None
+
+
+def enable(folder):
+    """Record the phases of this process and of the processes started from
+    it in folder"""
+
+    os.environ[TRACE_VARIABLE] = folder
+
+
+def peak_rss():
+    """Peak resident memory of the process in MB, NaN where the resource
+    module is not available (Windows)"""
+
+    if resource is None:
+        return float('nan')
+    # ru_maxrss is in kB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak/1024**2 if sys.platform == 'darwin' else peak/1024
+
+
+def _reset_after_fork():
+    # a forked worker inherits the events of its parent, which are written
+    # by the parent
+    if _state['pid'] != os.getpid():
+        _events.clear()
+        _state.update(pid=os.getpid(), depth=0, start=time.time())
+        instrument_optimization()
+
+
+def trace_path():
+    """Trace file of this process"""
+
+    script = os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'python'
+    return os.path.join(trace_folder(), '{}-{}.json'.format(script,
+                                                            os.getpid()))
+
+
+def write_trace(path=None):
+    """Write the phases recorded in this process to path (by default
+    trace_path) in the Chrome trace format"""
+
+    path = path or trace_path()
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    trace = {'traceEvents': list(_events),
+             'displayTimeUnit': 'ms',
+             'otherData': {'argv': sys.argv, 'pid': os.getpid(),
+                           'start': _state['start']}}
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(trace, f)
+    os.replace(tmp, path)
+
+
+@contextlib.contextmanager
+def phase(name, **args):
+    """Record the wall time, CPU time and peak memory of the code in the
+    with block as the phase name, args are stored with the phase"""
+
+    if trace_folder() is None:
+        yield
+        return
+    _reset_after_fork()
+    rss = peak_rss()
+    start = time.time()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    _state['depth'] += 1
+    try:
+        yield
+    finally:
+        _state['depth'] -= 1
+        peak = peak_rss()
+        args.update(cpu_time=time.process_time() - cpu,
+                    peak_rss=peak,
+                    peak_rss_increase=peak - rss)
+        _events.append({'name': name, 'cat': 'phase', 'ph': 'X',
+                        'ts': start*1e6,
+                        'dur': (time.perf_counter() - wall)*1e6,
+                        'pid': os.getpid(), 'tid': threading.get_ident(),
+                        'args': args})
+        # the workers of a process pool exit without running atexit, so
+        # the trace is written at the end of every outermost phase
+        if _state['depth'] == 0:
+            write_trace()
+
+
+def instrumented(name=None):
+    """Decorator recording every call of the function as a phase, named as
+    the function by default"""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with phase(name or function.__name__):
+                return function(*args, **kwargs)
+        wrapper._phase = name or function.__name__
+        return wrapper
+    return decorator
+
+
+def _instrument_method(cls, attr, name):
+    method = getattr(cls, attr)
+    if not hasattr(method, '_phase'):
+        setattr(cls, attr, instrumented(name)(method))
+
+
+def instrument_optimization():
+    """Record the creation of the linear model, the solver and the
+    assignment of the solution inside network.optimize as phases"""
+
+    import linopy
+    from pypsa.optimization.optimize import OptimizationAccessor
+
+    _instrument_method(OptimizationAccessor, 'create_model', 'create model')
+    _instrument_method(linopy.Model, 'solve', 'solver')
+    _instrument_method(OptimizationAccessor, 'assign_solution',
+                       'assign solution')
+
+
+def read_traces(paths):
+    """Phases of the trace files in paths (files or folders), one row per
+    phase with the wall and self time (without the nested phases) in s"""
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, '*.json')))
+        else:
+            files.append(path)
+    tables = []
+    for path in files:
+        with open(path) as f:
+            events = json.load(f)['traceEvents']
+        if not events:
+            continue
+        df = pd.DataFrame(events)
+        df = pd.concat([df.drop(columns='args'),
+                        pd.DataFrame(list(df.args), index=df.index)], axis=1)
+        df['file'] = os.path.basename(path)
+        df['wall_time'] = df.dur/1e6
+        df['self_time'] = df.wall_time - _children_time(df)
+        tables.append(df)
+    if not tables:
+        return pd.DataFrame(columns=['file', 'name', 'wall_time', 'self_time',
+                                     'cpu_time', 'peak_rss'])
+    return pd.concat(tables, ignore_index=True)
+
+
+def _children_time(df):
+    """Wall time in s of the phases directly nested in every phase"""
+
+    children = pd.Series(0., index=df.index)
+    for _, thread in df.groupby(['pid', 'tid']):
+        # parents first when they start at the same time
+        thread = thread.sort_values(['ts', 'dur'], ascending=[True, False])
+        stack = []
+        for i, ts, dur in zip(thread.index, thread.ts, thread.dur):
+            while stack and ts >= stack[-1][1]:
+                stack.pop()
+            if stack:
+                children[stack[-1][0]] += dur/1e6
+            stack.append((i, ts + dur))
+    return children
+
+
+def summarize(phases, by=('name',)):
+    """Number of calls, total and mean wall time, self time and CPU time in s
+    and peak memory in MB of the phases grouped by by"""
+
+    grouped = phases.groupby(list(by))
+    summary = grouped.agg(calls=('wall_time', 'size'),
+                          wall_time=('wall_time', 'sum'),
+                          mean_wall_time=('wall_time', 'mean'),
+                          self_time=('self_time', 'sum'),
+                          cpu_time=('cpu_time', 'sum'),
+                          peak_rss=('peak_rss', 'max'))
+    return summary.sort_values('self_time', ascending=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('traces', nargs='+',
+                        help='trace files or folders with trace files')
+    parser.add_argument('--by', nargs='+', default=['name'],
+                        help="columns to group by, e.g. 'file' 'name'")
+    parser.add_argument('--output', help='csv file for the summary')
+    args = parser.parse_args()
+
+    summary = summarize(read_traces(args.traces), args.by)
+    with pd.option_context('display.width', 200,
+                           'display.max_columns', None):
+        print(summary.round(3))
+    if args.output:
+        summary.to_csv(args.output)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Market revenues and market values of every component in a solved network.
+
+Every generator, storage unit, store and link is mapped to the columns of
+its bus(es) in network.buses_t.marginal_price at once and the metrics are
+computed with matrix operations for all the components of a class:
+
+energy        : energy supplied to the bus in MWh (positive dispatch)
+revenue       : net revenue in €, price x dispatch summed over the
+                snapshots (charging counts as a cost for storage)
+market_value  : revenue of the energy supplied divided by the energy, in €/MWh
+average_price : time-weighted average price at the bus in €/MWh
+capture_rate  : market_value / average_price
+
+All the sums are weighted by network.snapshot_weightings.objective, so that
+networks with 3H resolution are also correct.
+"""
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import instrumented
+
+METRICS = ['energy', 'revenue', 'market_value', 'average_price',
+           'capture_rate']
+
+
+def _price_matrix(network, buses):
+    """(snapshots x components) array with the price at the bus of every
+    component"""
+
+    prices = network.buses_t.marginal_price
+    positions = prices.columns.get_indexer(pd.Index(buses))
+    if (positions < 0).any():
+        raise KeyError('no marginal price for buses {}'.format(
+            list(pd.Index(buses)[positions < 0].unique())))
+    return prices.values[:, positions]
+
+
+def _one_port_values(network, static, p, component):
+    """Metrics for generators, storage units or stores, p is the
+    (snapshots x components) dispatch"""
+
+    w = network.snapshot_weightings.objective.values
+    p = p.reindex(columns=static.index, fill_value=0.).values
+    price = _price_matrix(network, static.bus)
+    supplied = np.clip(p, 0, None)
+    energy = w @ supplied
+    revenue = w @ (p*price)
+    average_price = w @ price/w.sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        market_value = (w @ (supplied*price))/energy
+        capture_rate = market_value/average_price
+    return pd.DataFrame({'component': component,
+                         'carrier': static.carrier.values,
+                         'bus': static.bus.values,
+                         'energy': energy,
+                         'revenue': revenue,
+                         'market_value': market_value,
+                         'average_price': average_price,
+                         'capture_rate': capture_rate},
+                        index=static.index)
+
+
+def _link_values(network):
+    """Metrics for links: the output at bus1 is the energy and the revenue
+    is the value of the output minus the cost of the input at bus0"""
+
+    links = network.links
+    w = network.snapshot_weightings.objective.values
+    p0 = network.links_t.p0.reindex(columns=links.index, fill_value=0.).values
+    p1 = network.links_t.p1.reindex(columns=links.index, fill_value=0.).values
+    price0 = _price_matrix(network, links.bus0)
+    price1 = _price_matrix(network, links.bus1)
+    supplied = np.clip(-p1, 0, None)
+    energy = w @ supplied
+    revenue = -(w @ (p0*price0 + p1*price1))
+    average_price = w @ price1/w.sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        market_value = (w @ (supplied*price1))/energy
+        capture_rate = market_value/average_price
+    return pd.DataFrame({'component': 'Link',
+                         'carrier': links.carrier.values,
+                         'bus': links.bus1.values,
+                         'energy': energy,
+                         'revenue': revenue,
+                         'market_value': market_value,
+                         'average_price': average_price,
+                         'capture_rate': capture_rate},
+                        index=links.index)
+
+
+@instrumented('market values')
+def market_values(network, components=('Generator', 'StorageUnit', 'Store',
+                                       'Link')):
+    """(component x metric) table for all the components of the classes in
+    components, see the metrics in the description of the module"""
+
+    tables = []
+    if 'Generator' in components and len(network.generators):
+        tables.append(_one_port_values(network, network.generators,
+                                       network.generators_t.p, 'Generator'))
+    if 'StorageUnit' in components and len(network.storage_units):
+        tables.append(_one_port_values(network, network.storage_units,
+                                       network.storage_units_t.p,
+                                       'StorageUnit'))
+    if 'Store' in components and len(network.stores):
+        tables.append(_one_port_values(network, network.stores,
+                                       network.stores_t.p, 'Store'))
+    if 'Link' in components and len(network.links):
+        tables.append(_link_values(network))
+    if not tables:
+        return pd.DataFrame(columns=['component', 'carrier', 'bus'] + METRICS)
+    return pd.concat(tables)
+
+
+def market_values_by_carrier(table):
+    """Energy and revenue summed by component class and carrier, with the
+    market value and capture rate of the aggregate"""
+
+    table = table.assign(supplied_value=table.market_value.fillna(0)
+                         * table.energy,
+                         weighted_price=table.average_price*table.energy)
+    grouped = table.groupby(['component', 'carrier'])[
+        ['energy', 'revenue', 'supplied_value', 'weighted_price']].sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        grouped['market_value'] = grouped.supplied_value/grouped.energy
+        grouped['capture_rate'] = (grouped.supplied_value
+                                   /grouped.weighted_price)
+    return grouped.drop(columns=['supplied_value', 'weighted_price'])
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Sensitivity runs on one linear model, built once and updated in place.
+
+network.optimize builds the whole linear model every time it is called, which
+for a multi-node network with 8760 snapshots takes longer than some solves.
+Here the model is created once and only the parameters that change are
+updated before solving again:
+
+- the CO2 limit is the right-hand side of the 'GlobalConstraint-co2_limit'
+  constraint
+- the capital and marginal costs are coefficients of the objective, which is
+  rebuilt from the network tables (the constraints are kept)
+
+Every solve starts from the basis of the previous one when the solver can
+read a basis file, and the results are written to the network tables as by
+network.optimize, e.g.
+
+network = build_network('ESP')
+create_model(network, co2_limit=20e6)
+resolve(network, basis_fn='basis.bas')
+set_model_co2_limit(network, 10e6)
+update_costs(network, 'Generator', marginal_cost={'OCGT': 80.})
+resolve(network, basis_fn='basis.bas')
+network.generators.p_nom_opt
+"""
+
+import os
+
+import pandas as pd
+from pypsa.optimization.optimize import define_objective
+
+from network_builder import set_co2_limit
+from solve_network import WARMSTART_SOLVERS, pick_solver, solver_options
+
+# attributes of the components that only appear in the objective
+COST_ATTRIBUTES = ['capital_cost', 'marginal_cost']
+
+
+def create_model(network, co2_limit=None):
+    """Create the linear model of network, with the CO2 limit if given"""
+
+    if co2_limit is not None:
+        set_co2_limit(network, co2_limit)
+    # without the constant of the existing capacities as a variable, so that
+    # the objective can be rebuilt
+    network.optimize.create_model(include_objective_constant=False)
+    return network.model
+
+
+def set_model_co2_limit(network, co2_limit):
+    """Change the CO2 limit in the network and in its model"""
+
+    set_co2_limit(network, co2_limit)
+    constraints = network.model.constraints
+    if 'GlobalConstraint-co2_limit' not in constraints:
+        raise KeyError('the model has no CO2 limit, create the model with '
+                       'a co2_limit')
+    constraints['GlobalConstraint-co2_limit'].rhs = co2_limit
+
+
+def update_costs(network, component='Generator', **costs):
+    """Change capital_cost and/or marginal_cost of component, given as a
+    number for all of them or by name (dict or Series), and rebuild the
+    objective of the model"""
+
+    static = network.components[component].static
+    for attr, values in costs.items():
+        if attr not in COST_ATTRIBUTES:
+            raise ValueError('only {} can be updated, not {!r}'.format(
+                COST_ATTRIBUTES, attr))
+        if isinstance(values, (dict, pd.Series)):
+            values = pd.Series(values, dtype=float)
+            missing = values.index.difference(static.index)
+            if len(missing):
+                raise KeyError('no {} {}'.format(component, list(missing)))
+            static.loc[values.index, attr] = values
+        else:
+            static[attr] = float(values)
+    define_objective(network, network.snapshots,
+                     include_objective_constant=False, piecewise_options=[])
+
+
+def resolve(network, solver_name=None, mode='simplex', threads=None,
+            options=None, basis_fn=None):
+    """Solve the model of network and write the results to the network.
+    If basis_fn is given, the solve starts from the basis in that file (if it
+    exists) and the final basis is written to it. Returns the status and
+    condition of the optimization."""
+
+    solver_name = pick_solver(solver_name)
+    kwargs = {}
+    if basis_fn is not None and solver_name in WARMSTART_SOLVERS:
+        kwargs['basis_fn'] = basis_fn
+        if os.path.exists(basis_fn):
+            kwargs['warmstart_fn'] = basis_fn
+    return network.optimize.solve_model(
+        solver_name=solver_name,
+        solver_options=solver_options(solver_name, mode, threads,
+                                      **(options or {})),
+        **kwargs)
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Build the network of the MESM project from the cached demand and capacity
+factors, with the same technologies and cost assumptions as in
+MESM_project.py.
+
+The cost assumed for the generators are the same as in the paper
+https://doi.org/10.1016/j.enconman.2019.111977 (open version:
+https://arxiv.org/pdf/1906.06936.pdf)
+"""
+
+import pandas as pd
+import pypsa
+
+from data_cache import load_demand
+from capacity_factors import get_cf
+from instrumentation import instrumented, phase
+
+
+def annuity(n,r):
+    """Calculate the annuity factor for an asset with lifetime n years and
+    discount rate of r, e.g. annuity(20,0.05)*20 = 1.6"""
+
+    if r > 0:
+        return r/(1. - 1./(1.+r)**n)
+    else:
+        return 1/n
+
+
+capital_cost_onshorewind = annuity(30,0.07)*910000*(1+0.033) # in €/MW
+capital_cost_solar = annuity(25,0.07)*425000*(1+0.03) # in €/MW
+capital_cost_OCGT = annuity(25,0.07)*560000*(1+0.033) # in €/MW
+fuel_cost = 21.6 # in €/MWh_th
+efficiency = 0.39
+marginal_cost_OCGT = fuel_cost/efficiency # in €/MWh_el
+capital_cost_H2_tank = annuity(25, 0.07)*57000*(1+0.011) # in €/MWh
+capital_cost_electrolysis = annuity(25, 0.07)*600000*(1+0.05) # in €/MW
+capital_cost_fuel_cell = annuity(10, 0.07)*1300000*(1+0.05) # in €/MW
+capital_cost_transmission = 400*600 # capital cost [EUR/MW/km] * length [km]
+
+# changed with the components or attributes of the networks built, so that
+# the networks in the cache (see network_cache.py) are built again
+NETWORK_VERSION = 2 # 2: carriers of the links
+
+
+def costs():
+    """Cost assumptions used to build the networks"""
+
+    return {'capital_cost_onshorewind': capital_cost_onshorewind,
+            'capital_cost_solar': capital_cost_solar,
+            'capital_cost_OCGT': capital_cost_OCGT,
+            'marginal_cost_OCGT': marginal_cost_OCGT,
+            'capital_cost_H2_tank': capital_cost_H2_tank,
+            'capital_cost_electrolysis': capital_cost_electrolysis,
+            'capital_cost_fuel_cell': capital_cost_fuel_cell,
+            'capital_cost_transmission': capital_cost_transmission}
+
+
+def hours_in_year(year=2015):
+    """Hourly snapshots of year, in UTC but without time zone as newer
+    versions of PyPSA do not accept time zones in the snapshots"""
+
+    return pd.date_range('{}-01-01 00:00'.format(year),
+                         '{}-12-31 23:00'.format(year), freq='h')
+
+
+def madd(network, class_name, names, **kwargs):
+    """Add several components at once, network.madd was removed in PyPSA 1.0
+    where network.add accepts a list of names instead"""
+
+    with phase('add ' + class_name):
+        if hasattr(network, 'madd'):
+            return network.madd(class_name, names, **kwargs)
+        return network.add(class_name, names, **kwargs)
+
+
+@instrumented('build network')
+def build_network(countries='ESP', weather_year=None, h2_storage=False):
+    """Network with onshore wind, solar PV and OCGT generators.
+
+    If countries is one country code (e.g. 'ESP') the network is the
+    single-node example in MESM_project.py. If it is a list (e.g. ['DNK',
+    'NOR', 'SWE']) every country is a node and all the nodes are connected
+    with extendable links, as in the multi-node example. The snapshots and
+    the demand are those of 2015, the capacity factors are taken from
+    weather_year (2015 if None). If h2_storage is True, H2 tanks with
+    electrolysis and fuel cell links are added to every node."""
+
+    network = pypsa.Network()
+    network.set_snapshots(hours_in_year(2015))
+
+    # add the different carriers, only gas emits CO2
+    network.add("Carrier", "gas", co2_emissions=0.19) # in t_CO2/MWh_th
+    network.add("Carrier", "onshorewind")
+    network.add("Carrier", "solar")
+
+    if isinstance(countries, str):
+        nodes = pd.Index(["electricity bus"])
+        prefix = pd.Index([""])
+        loads = pd.Index(["load"])
+        countries = [countries]
+    else:
+        nodes = pd.Index(countries)
+        prefix = nodes + " "
+        loads = nodes
+
+    madd(network, "Bus", nodes)
+
+    demand = load_demand('electricity', countries)
+    madd(network, "Load",
+         loads,
+         bus=nodes,
+         p_set=pd.DataFrame(demand.values, network.snapshots, loads))
+
+    CF_wind = get_cf('onshorewind', countries, network.snapshots,
+                     year=weather_year)
+    madd(network, "Generator",
+         prefix + "onshorewind",
+         bus=nodes,
+         p_nom_extendable=True,
+         carrier="onshorewind",
+         capital_cost = capital_cost_onshorewind,
+         marginal_cost = 0,
+         p_max_pu = pd.DataFrame(CF_wind.values, network.snapshots,
+                                 prefix + "onshorewind"))
+
+    CF_solar = get_cf('solar', countries, network.snapshots,
+                      year=weather_year)
+    madd(network, "Generator",
+         prefix + "solar",
+         bus=nodes,
+         p_nom_extendable=True,
+         carrier="solar",
+         capital_cost = capital_cost_solar,
+         marginal_cost = 0,
+         p_max_pu = pd.DataFrame(CF_solar.values, network.snapshots,
+                                 prefix + "solar"))
+
+    madd(network, "Generator",
+         prefix + "OCGT",
+         bus=nodes,
+         p_nom_extendable=True,
+         carrier="gas",
+         capital_cost = capital_cost_OCGT,
+         marginal_cost = marginal_cost_OCGT)
+
+    # links between every pair of countries
+    bus0 = [a for i, a in enumerate(nodes) for b in nodes[i+1:]]
+    bus1 = [b for i, a in enumerate(nodes) for b in nodes[i+1:]]
+    if bus0:
+        network.add("Carrier", "DC")
+        madd(network, "Link",
+             pd.Index(bus0) + " - " + pd.Index(bus1),
+             bus0=bus0,
+             bus1=bus1,
+             carrier="DC",
+             p_nom_extendable=True, # capacity is optimised
+             p_min_pu=-1,
+             length=600, # length (in km) between country a and country b
+             capital_cost=capital_cost_transmission)
+
+    if h2_storage:
+        add_h2_storage(network, nodes, prefix)
+
+    return network
+
+
+def add_h2_storage(network, nodes, prefix):
+    """H2 tank connected to every node through electrolysis and fuel cell"""
+
+    network.add("Carrier", "H2")
+    network.add("Carrier", "H2 Electrolysis")
+    network.add("Carrier", "H2 Fuel Cell")
+
+    madd(network, "Bus",
+         prefix + "H2",
+         location = nodes,
+         carrier = "H2")
+
+    madd(network, "Store",
+         prefix + "H2 Tank",
+         bus = prefix + "H2",
+         e_nom_extendable = True,
+         e_cyclic = True,
+         capital_cost = capital_cost_H2_tank)
+
+    madd(network, "Link",
+         prefix + "H2 Electrolysis",
+         bus0 = nodes,
+         bus1 = prefix + "H2",
+         carrier = "H2 Electrolysis",
+         p_nom_extendable = True,
+         efficiency = 0.8,
+         capital_cost = capital_cost_electrolysis)
+
+    madd(network, "Link",
+         prefix + "H2 Fuel Cell",
+         bus0 = prefix + "H2",
+         bus1 = nodes,
+         carrier = "H2 Fuel Cell",
+         p_nom_extendable = True,
+         efficiency = 0.58,
+         capital_cost = capital_cost_fuel_cell)
+
+
+def set_co2_limit(network, co2_limit):
+    """Add the global CO2 constraint (in tonCO2) or update its constant"""
+
+    if "co2_limit" in network.global_constraints.index:
+        network.global_constraints.loc["co2_limit", "constant"] = co2_limit
+    else:
+        network.add("GlobalConstraint",
+                    "co2_limit",
+                    type="primary_energy",
+                    carrier_attribute="co2_emissions",
+                    sense="<=",
+                    constant=co2_limit)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of built (not solved) networks.
+
+Every network built by network_builder.build_network is identified by the
+hash of its scenario configuration: countries, weather year, technologies,
+cost assumptions, the version of the builder (NETWORK_VERSION) and the
+hashes of the data files it is built from. The
+network is saved as netCDF in 'data/cache/networks' and loaded from there the
+next time the same configuration is requested, e.g. when only a solver option
+changes. When the files in the cache exceed MAX_CACHE_SIZE, the least
+recently used networks are removed.
+"""
+
+import glob
+import hashlib
+import json
+import os
+
+import pypsa
+
+import network_builder
+from capacity_factors import CF_FILES
+from data_cache import CACHE_DIR, DEMAND_FILES, REPO_DIR, stored_file_hash
+
+NETWORK_CACHE_DIR = os.path.join(CACHE_DIR, 'networks')
+
+MAX_CACHE_SIZE = 5e9 # in bytes
+
+
+def scenario_config(countries='ESP', weather_year=None, h2_storage=False):
+    """Everything that determines the network built by build_network"""
+
+    # equal lists of countries (e.g. a list, array or pd.Index) give the same
+    # configuration, a single country is the single-node network
+    if not isinstance(countries, str):
+        countries = [str(c) for c in countries]
+    data_files = [DEMAND_FILES['electricity']] + list(CF_FILES.values())
+    return {'countries': countries,
+            'weather_year': weather_year,
+            'h2_storage': h2_storage,
+            'version': network_builder.NETWORK_VERSION,
+            'costs': network_builder.costs(),
+            'data': {path: stored_file_hash(os.path.join(REPO_DIR, path))
+                     for path in data_files}}
+
+
+def scenario_hash(config):
+    """Hash identifying a scenario configuration"""
+
+    return hashlib.sha1(json.dumps(config, sort_keys=True)
+                        .encode()).hexdigest()
+
+
+def evict(max_size=MAX_CACHE_SIZE, keep=()):
+    """Remove the least recently used networks until the cache takes less
+    than max_size bytes, the files in keep are not removed"""
+
+    files = sorted(glob.glob(os.path.join(NETWORK_CACHE_DIR, '*.nc')),
+                   key=os.path.getmtime)
+    total = sum(os.path.getsize(f) for f in files)
+    for f in files:
+        if total <= max_size:
+            break
+        if f in keep:
+            continue
+        total -= os.path.getsize(f)
+        os.remove(f)
+
+
+def cached_build_network(countries='ESP', weather_year=None,
+                         h2_storage=False, max_size=MAX_CACHE_SIZE):
+    """Same as network_builder.build_network, but the network is loaded from
+    the cache if it was built before with the same configuration"""
+
+    config = scenario_config(countries, weather_year, h2_storage)
+    path = os.path.join(NETWORK_CACHE_DIR, scenario_hash(config) + '.nc')
+    if os.path.exists(path):
+        # the modification time records the last use
+        os.utime(path)
+        return pypsa.Network(path)
+
+    network = network_builder.build_network(countries, weather_year,
+                                            h2_storage)
+    os.makedirs(NETWORK_CACHE_DIR, exist_ok=True)
+    tmp = path[:-len('.nc')] + '.tmp%d.nc' % os.getpid()
+    network.export_to_netcdf(tmp)
+    os.replace(tmp, path)
+    evict(max_size, keep=[path])
+    # loaded from the file as on a cache hit, so that the network is the
+    # same (e.g. datetime64[ns] snapshots) whether it was cached or not
+    return pypsa.Network(path)
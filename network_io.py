@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""
+Read only some tables of a network saved by PyPSA as netCDF (.nc) or HDF5
+(.h5), without importing the whole network.
+
+The tables are given as 'list_name.attr' for static attributes (e.g.
+'links.p_nom_opt') and 'list_name_t.attr' for time series (e.g.
+'buses_t.marginal_price'). The result can be used as a network in the
+post-processing functions, e.g.
+
+network = read_network('postnetwork-elec_only_0_0.05.h5',
+                       ['loads_t.p', 'buses_t.marginal_price',
+                        'links.p_nom_opt'])
+network.loads_t.p
+network.links.p_nom_opt
+network.objective
+
+open_network opens the file and reads every table only when it is used, so
+that a large network is opened in less than a second and only the tables
+used in the post-processing are read:
+
+with open_network('postnetwork-elec_only_0_0.05.h5') as network:
+    market_values(network)
+"""
+
+import functools
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pypsa
+
+from compact_timeseries import compact_frame
+from instrumentation import instrumented
+
+
+@functools.lru_cache(maxsize=None)
+def component_attrs():
+    """Attributes (type, default...) of every component by list_name"""
+
+    empty = pypsa.Network()
+    return {c.list_name: c.attrs
+            for c in empty.iterate_components(skip_empty=False)}
+
+
+def parse_tables(tables):
+    """{list_name: [attr]} for static and {list_name_t: [attr]} for time
+    series from a list of 'list_name.attr' strings, None instead of the list
+    of attributes for the static tables requested without attribute"""
+
+    parsed = {}
+    for table in tables:
+        list_name, _, attr = table.partition('.')
+        if not attr:
+            # the whole table
+            parsed[list_name] = None
+        elif parsed.get(list_name, []) is not None:
+            parsed.setdefault(list_name, []).append(attr)
+    return parsed
+
+
+def _static_attrs(list_name, stored):
+    """All the static attributes of the component and the other attributes
+    stored in the file"""
+
+    defaults = component_attrs()[list_name]
+    attrs = [a for a in defaults.index[defaults.static] if a != 'name']
+    return attrs + [a for a in stored if a not in attrs and a != 'name']
+
+
+def _default_static(list_name, index, attrs):
+    """Static DataFrame with the default values of attrs"""
+
+    defaults = component_attrs()[list_name]
+    df = pd.DataFrame(index=index)
+    for attr in attrs:
+        default = defaults.at[attr, 'default']
+        dtype = defaults.at[attr, 'typ']
+        df[attr] = pd.Series(default, index=index, dtype=dtype)
+    return df
+
+
+def _complete_series(list_name, attr, df, index):
+    """Time series of the output attributes (e.g. p, marginal_price) for all
+    the components, PyPSA only stores the columns that differ from the
+    default. The input time series keep only the columns stored, as in
+    pypsa.Network(path)."""
+
+    attrs = component_attrs()[list_name]
+    if (df.columns.empty or attr not in attrs.index
+            or not attrs.at[attr, 'status'].startswith('Output')):
+        return df
+    return df.reindex(columns=index, fill_value=attrs.at[attr, 'default'])
+
+
+class _NetCDFReader:
+
+    def __init__(self, path):
+        import xarray as xr
+        self.ds = xr.open_dataset(path)
+
+    def close(self):
+        self.ds.close()
+
+    def attributes(self):
+        attrs = self.ds.attrs
+        # newer versions of PyPSA add an underscore to the network attributes
+        objective = attrs.get('network__objective',
+                              attrs.get('network_objective', np.nan))
+        return {'objective': float(objective)}
+
+    def snapshots(self):
+        # newer versions of PyPSA store the snapshots as a variable
+        name = ('snapshots_snapshot' if 'snapshots_snapshot' in self.ds
+                else 'snapshots')
+        snapshots = pd.Index(self.ds[name].values, name='snapshot')
+        columns = ['objective', 'stores', 'generators']
+        weightings = pd.DataFrame(1., index=snapshots, columns=columns)
+        for column in columns:
+            if 'snapshots_' + column in self.ds:
+                weightings[column] = self.ds['snapshots_' + column].values
+        return snapshots, weightings
+
+    def index(self, list_name):
+        if list_name + '_i' not in self.ds.coords:
+            return pd.Index([], name=None)
+        return pd.Index(self.ds[list_name + '_i'].values.astype(str))
+
+    def static(self, list_name, attrs):
+        index = self.index(list_name)
+        if attrs is None:
+            attrs = _static_attrs(list_name, [
+                v[len(list_name) + 1:] for v in self.ds.data_vars
+                if v.startswith(list_name + '_')
+                and not v.startswith(list_name + '_t_')])
+        df = _default_static(list_name, index, attrs)
+        for attr in attrs:
+            if list_name + '_' + attr in self.ds:
+                df[attr] = self.ds[list_name + '_' + attr].values
+        return df
+
+    def series(self, list_name, attr, snapshots):
+        name = list_name + '_t_' + attr
+        if name not in self.ds:
+            return pd.DataFrame(index=snapshots)
+        data = self.ds[name]
+        df = pd.DataFrame(data.values, index=snapshots,
+                          columns=pd.Index(data[name + '_i'].values
+                                           .astype(str)))
+        return _complete_series(list_name, attr, df, self.index(list_name))
+
+
+class _HDF5Reader:
+
+    def __init__(self, path):
+        self.store = pd.HDFStore(path, mode='r')
+        self.keys = set(self.store.keys())
+        self._index = {}
+
+    def close(self):
+        self.store.close()
+
+    def attributes(self):
+        network = self.store['/network']
+        objective = np.nan
+        for column in ['_objective', 'objective']:
+            if column in network.columns:
+                objective = network[column].iloc[0]
+        return {'objective': float(objective)}
+
+    def snapshots(self):
+        df = self.store['/snapshots']
+        snapshots = pd.Index(df.iloc[:, 0].values, name='snapshot')
+        columns = ['objective', 'stores', 'generators']
+        weightings = pd.DataFrame(1., index=snapshots, columns=columns)
+        for column in columns:
+            if column in df.columns:
+                weightings[column] = df[column].values
+        return snapshots, weightings
+
+    def index(self, list_name):
+        if list_name not in self._index:
+            if '/' + list_name in self.keys:
+                names = self.store.select('/' + list_name, columns=['name'])
+                self._index[list_name] = pd.Index(names['name'].values)
+            else:
+                self._index[list_name] = pd.Index([])
+        return self._index[list_name]
+
+    def static(self, list_name, attrs):
+        index = self.index(list_name)
+        stored = []
+        if '/' + list_name in self.keys:
+            stored = self.store.get_storer('/' + list_name).non_index_axes[0][1]
+        if attrs is None:
+            attrs = _static_attrs(list_name, stored)
+        df = _default_static(list_name, index, attrs)
+        columns = [a for a in attrs if a in stored]
+        if columns:
+            values = self.store.select('/' + list_name, columns=columns)
+            for attr in columns:
+                df[attr] = values[attr].values
+        return df
+
+    def series(self, list_name, attr, snapshots):
+        key = '/' + list_name + '_t/' + attr
+        if key not in self.keys:
+            return pd.DataFrame(index=snapshots)
+        df = self.store[key]
+        # the columns are stored as positions in the static table
+        df.columns = self.index(list_name)[df.columns.astype(int)]
+        df.index = snapshots
+        return _complete_series(list_name, attr, df, self.index(list_name))
+
+
+def open_reader(path):
+    """Reader for the netCDF or HDF5 file in path"""
+
+    if str(path).endswith(('.h5', '.hdf5')):
+        return _HDF5Reader(path)
+    return _NetCDFReader(path)
+
+
+@instrumented('read network')
+def read_network(path, tables, compact=False):
+    """Namespace with the tables of the network in path, the objective,
+    snapshots and snapshot_weightings. Static tables requested without
+    attribute (e.g. 'generators') are read completely. With compact=True
+    the time series are stored as float32 or sparse (see
+    compact_timeseries.py)."""
+
+    reader = open_reader(path)
+    try:
+        snapshots, weightings = reader.snapshots()
+        network = SimpleNamespace(snapshots=snapshots,
+                                  snapshot_weightings=weightings,
+                                  **reader.attributes())
+        for list_name, attrs in parse_tables(tables).items():
+            if list_name.endswith('_t'):
+                component = list_name[:-len('_t')]
+                series = SimpleNamespace()
+                for attr in attrs:
+                    df = reader.series(component, attr, snapshots)
+                    if compact:
+                        df = compact_frame(df)
+                    setattr(series, attr, df)
+                setattr(network, list_name, series)
+            else:
+                setattr(network, list_name,
+                        reader.static(list_name, attrs))
+    finally:
+        reader.close()
+    return network
+
+
+class _LazySeries:
+    """Time series of one component, read the first time they are used"""
+
+    def __init__(self, network, list_name):
+        self._network = network
+        self._list_name = list_name
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        network = self._network
+        df = network._reader.series(self._list_name, attr, network.snapshots)
+        if network._compact:
+            df = compact_frame(df)
+        setattr(self, attr, df)
+        return df
+
+    def __getitem__(self, attr):
+        return getattr(self, attr)
+
+
+class LazyNetwork:
+    """Network whose tables are read from the file the first time they are
+    used, see open_network"""
+
+    def __init__(self, path, compact=False):
+        self._reader = open_reader(path)
+        self._compact = compact
+        self.snapshots, self.snapshot_weightings = self._reader.snapshots()
+        for name, value in self._reader.attributes().items():
+            setattr(self, name, value)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name.endswith('_t') and name[:-len('_t')] in component_attrs():
+            table = _LazySeries(self, name[:-len('_t')])
+        elif name in component_attrs():
+            table = self._reader.static(name, None)
+        else:
+            raise AttributeError('{} is not a table of the network'
+                                 .format(name))
+        setattr(self, name, table)
+        return table
+
+    def close(self):
+        self._reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def open_network(path, compact=False):
+    """Network in path whose static tables (e.g. network.links) and time
+    series (e.g. network.loads_t.p) are read only when they are first used,
+    the file is kept open until network.close() is called, e.g.
+
+    with open_network('postnetwork-elec_only_0_0.05.h5') as network:
+        network.loads_t.p.sum()
+
+    With compact=True the time series are stored as float32 or sparse (see
+    compact_timeseries.py)."""
+
+    return LazyNetwork(path, compact)
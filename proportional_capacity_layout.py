@@ -19,6 +19,9 @@ import cartopy.io.shapereader as shpreader
 #import xarray as xr
 import atlite
 
+from atlite_conversion import (aggregate, capacity_factor_timeseries,
+                               mean_capacity_factor)
+
 import logging
 import warnings
 
@@ -108,7 +111,13 @@ plt.savefig('figures/weather_time_series.jpg',
 
 #%% (not mandatory) Plotting 
 #annual capacity factors for wind and solar PV
-cap_factors_wind = cutout.wind(turbine="Vestas_V112_3MW", capacity_factor=True)
+# hourly capacity factors of every cell, converted once and cached, the maps
+# and aggregated time series below are computed from them
+cf_wind = capacity_factor_timeseries(cutout, 'wind', turbine="Vestas_V112_3MW")
+cf_solar = capacity_factor_timeseries(cutout, 'pv', panel="CSi",
+                                      orientation={"slope": 30.0, "azimuth": 180.0})
+
+cap_factors_wind = mean_capacity_factor(cf_wind)
 
 fig, ax = plt.subplots(subplot_kw={"projection": projection}, 
                        figsize=(11, 4))
@@ -123,9 +132,7 @@ plt.savefig('figures/capacity_factor_wind.jpg',
             dpi=300, bbox_inches='tight')
 
 correction_factor=0.5
-cap_factors_solar = correction_factor*cutout.pv(panel="CSi", 
-                        orientation={"slope": 30.0, "azimuth": 180.0},
-                        capacity_factor=True)
+cap_factors_solar = correction_factor*mean_capacity_factor(cf_solar)
 
 fig, ax = plt.subplots(subplot_kw={"projection": projection}, 
                         figsize=(11, 4))
@@ -143,9 +150,7 @@ plt.savefig('figures/capacity_factor_solar.jpg',
 # Create aggregated time-series for wind and solar
 cf_exponent=2
 layout_wind=cap_factors_wind**cf_exponent
-total_capacity_layout=layout_wind.values.sum()
-agg_cf_wind = (1/total_capacity_layout)*cutout.wind(turbine="Vestas_V112_3MW", 
-                                                    layout=layout_wind).to_pandas()
+agg_cf_wind = aggregate(cf_wind, layout_wind).to_pandas()
 fig, ax = plt.subplots(1, figsize=(12, 8))
 agg_cf_wind.plot.area(ax=ax)
 
@@ -164,10 +169,7 @@ plt.savefig('figures/agg_cf_wind.jpg',
 #%%
 cf_exponent=2
 layout_solar=cap_factors_solar**cf_exponent
-total_capacity_layout=layout_solar.values.sum()
-agg_cf_solar = (1/total_capacity_layout)*cutout.pv(panel="CSi", 
-                                                       orientation={"slope": 30.0, "azimuth": 180.0},
-                             layout=layout_solar,).to_pandas()
+agg_cf_solar = aggregate(cf_solar, layout_solar).to_pandas()
 
 fig, ax = plt.subplots(1, figsize=(12, 8))
 agg_cf_solar.plot.area(ax=ax, color='orange')
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Catalog of the solved networks in the results folders.
+
+The scenario parameters of every network are parsed from its file name, e.g.
+
+postnetwork-elec_only_0.125_0.05.h5
+    -> sector 'elec_only', transmission 0.125, co2 0.05
+base_s_90__Co2L0-3H-T-H-B-I-A-solar+p3-dist1_2050.nc (PyPSA-Eur)
+    -> run 'base', clusters 90, opts '', sector_opts 'Co2L0-3H-...',
+       planning_horizon 2050, co2 0.0
+
+A bare Co2L wildcard (the default limit of the configuration) gives
+co2_default True and no co2.
+
+and a fixed set of metrics is extracted (see summary_metrics): objective,
+capacities and energy by component and carrier, CO2 price and energy capacity
+of the stores. The metrics are stored in an SQLite database together with the
+modification time of every file. When the catalog is refreshed only the new
+files and those modified since the last refresh are opened again, in parallel
+processes. A file that cannot be read as a network is logged and recorded
+with its error (see catalog_errors) and is not opened again until it is
+modified, e.g.
+
+python results_catalog.py . results/CDRs --catalog results/catalog.sqlite
+
+catalog = load_catalog('results/catalog.sqlite')
+catalog[catalog.metric == 'capacity'].pivot_table(
+    index='co2', columns='carrier', values='value', aggfunc='sum')
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from network_io import open_network
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE = 'results/catalog.sqlite'
+
+# (regex, type of the numeric parameters) for the file names of the solved
+# networks, the first pattern that matches is used
+FILENAME_PATTERNS = [
+    (r'^postnetwork-(?P<sector>.+)_(?P<transmission>[\d.]+)_(?P<co2>[\d.]+)'
+     r'\.(?:h5|nc)$', {'transmission': float, 'co2': float}),
+    (r'^(?P<run>[^_]+)_s_(?P<clusters>\d+)_(?:(?P<ll>l[vc][\d.opt]+)_)?'
+     r'(?P<opts>[^_]*)_(?P<sector_opts>[^_]*)_(?P<planning_horizon>\d{4})'
+     r'\.(?:h5|nc)$', {'clusters': int, 'planning_horizon': int}),
+]
+
+# CO2 limit (Co2L, as share of 1990 emissions) or carbon budget (cb) in the
+# PyPSA-Eur wildcards
+CO2_WILDCARDS = [(r'(?:^|-)Co2L([\d.]*)', 'co2'),
+                 (r'(?:^|-)cb([\d.]+)', 'carbon_budget')]
+
+NETWORK_PATTERNS = ('*.h5', '*.nc')
+
+# components with capacities, their nominal attribute and dispatch
+COMPONENTS = [('Generator', 'generators', 'p_nom_opt', 'p', 1),
+              ('StorageUnit', 'storage_units', 'p_nom_opt', 'p', 1),
+              ('Link', 'links', 'p_nom_opt', 'p1', -1),
+              ('Store', 'stores', 'e_nom_opt', 'p', 1)]
+
+
+def parse_scenario(path):
+    """Scenario parameters in the file name of path"""
+
+    name = os.path.basename(path)
+    for pattern, numeric in FILENAME_PATTERNS:
+        match = re.match(pattern, name)
+        if match is None:
+            continue
+        params = {k: v for k, v in match.groupdict().items() if v is not None}
+        for key, typ in numeric.items():
+            params[key] = typ(params[key])
+        wildcards = '-'.join(params.get(k, '') for k in ['opts',
+                                                           'sector_opts'])
+        for wildcard, key in CO2_WILDCARDS:
+            found = re.search(wildcard, wildcards)
+            if found is None:
+                continue
+            if found.group(1):
+                params[key] = float(found.group(1))
+            else:
+                # limit of the configuration, not known from the file name
+                params[key + '_default'] = True
+        return params
+    return {}
+
+
+def summary_metrics(network):
+    """(metric, component, carrier, value) records of a solved network"""
+
+    records = [('objective', '', '', float(network.objective))]
+    weightings = network.snapshot_weightings.generators
+    for component, list_name, capacity, dispatch, sign in COMPONENTS:
+        static = getattr(network, list_name)
+        if static.empty:
+            continue
+        metric = 'energy_capacity' if capacity == 'e_nom_opt' else 'capacity'
+        by_carrier = static[capacity].groupby(static.carrier).sum()
+        records += [(metric, component, carrier, value)
+                    for carrier, value in by_carrier.items()]
+        p = getattr(network, list_name + '_t')[dispatch]
+        if p.empty:
+            continue
+        energy = sign*p.mul(weightings, axis=0).sum()
+        energy = energy.groupby(static.carrier.reindex(energy.index)).sum()
+        records += [('energy', component, carrier, value)
+                    for carrier, value in energy.items()]
+    constraints = network.global_constraints
+    if not constraints.empty and 'mu' in constraints:
+        co2 = constraints[constraints.index.str.contains('co2', case=False)]
+        records += [('co2_price', 'GlobalConstraint', name, -value)
+                    for name, value in co2.mu.items()]
+    return records
+
+
+def extract(path):
+    """Modification time, scenario parameters and metrics of the network in
+    path"""
+
+    stat = os.stat(path)
+    with open_network(path) as network:
+        records = summary_metrics(network)
+    return {'path': os.path.abspath(path),
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'scenario': parse_scenario(path),
+            'records': records}
+
+
+def connect(catalog=CATALOG_FILE):
+    """Connection to the catalog database, the tables are created if
+    needed"""
+
+    if os.path.dirname(catalog):
+        os.makedirs(os.path.dirname(catalog), exist_ok=True)
+    connection = sqlite3.connect(catalog)
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER,
+            scenario TEXT);
+        CREATE TABLE IF NOT EXISTS metrics (
+            path TEXT, metric TEXT, component TEXT, carrier TEXT,
+            value REAL);
+        CREATE INDEX IF NOT EXISTS metrics_path ON metrics (path);
+        CREATE TABLE IF NOT EXISTS errors (
+            path TEXT PRIMARY KEY, mtime_ns INTEGER, error TEXT);
+    """)
+    return connection
+
+
+def _store(connection, result):
+    with connection:
+        connection.execute('DELETE FROM metrics WHERE path = ?',
+                           (result['path'],))
+        connection.executemany(
+            'INSERT INTO metrics VALUES (?, ?, ?, ?, ?)',
+            [(result['path'],) + tuple(record)
+             for record in result['records']])
+        connection.execute(
+            'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)',
+            (result['path'], result['mtime_ns'], result['size'],
+             json.dumps(result['scenario'])))
+        connection.execute('DELETE FROM errors WHERE path = ?',
+                           (result['path'],))
+
+
+def _store_error(connection, path, mtime_ns, error):
+    logger.warning('%s could not be added to the catalog: %r', path, error)
+    with connection:
+        connection.execute('DELETE FROM metrics WHERE path = ?', (path,))
+        connection.execute('DELETE FROM files WHERE path = ?', (path,))
+        connection.execute('INSERT OR REPLACE INTO errors VALUES (?, ?, ?)',
+                           (path, mtime_ns, repr(error)))
+
+
+def network_files(directories, patterns=NETWORK_PATTERNS):
+    """Solved networks in the directories"""
+
+    return sorted(os.path.abspath(f) for directory in directories
+                  for pattern in patterns
+                  for f in glob.glob(os.path.join(directory, pattern)))
+
+
+def refresh_catalog(directories, catalog=CATALOG_FILE, processes=None):
+    """Add to the catalog the networks in directories that are new or were
+    modified, and remove the networks that do not exist anymore. The files
+    that fail are recorded in catalog_errors. Returns the paths of the files
+    processed."""
+
+    files = network_files(directories)
+    connection = connect(catalog)
+    try:
+        known = dict(connection.execute(
+            'SELECT path, mtime_ns FROM files UNION ALL '
+            'SELECT path, mtime_ns FROM errors').fetchall())
+        mtimes = {f: os.stat(f).st_mtime_ns for f in files}
+        todo = [f for f in files if known.get(f) != mtimes[f]]
+        directories = [os.path.abspath(d) for d in directories]
+        removed = [f for f in known if f not in files
+                   and os.path.dirname(f) in directories]
+        with connection:
+            for path in removed:
+                connection.execute('DELETE FROM metrics WHERE path = ?',
+                                   (path,))
+                connection.execute('DELETE FROM files WHERE path = ?',
+                                   (path,))
+                connection.execute('DELETE FROM errors WHERE path = ?',
+                                   (path,))
+        if todo:
+            with ProcessPoolExecutor(processes) as executor:
+                futures = {executor.submit(extract, f): f for f in todo}
+                # every file is stored as soon as it is processed, so an
+                # interrupted refresh keeps the files already processed
+                for future in as_completed(futures):
+                    try:
+                        result = future.result()
+                    except Exception as error:
+                        path = futures[future]
+                        _store_error(connection, path, mtimes[path], error)
+                    else:
+                        _store(connection, result)
+    finally:
+        connection.close()
+    return todo
+
+
+def catalog_errors(catalog=CATALOG_FILE):
+    """Table of the files that could not be added to the catalog, with the
+    error"""
+
+    connection = connect(catalog)
+    try:
+        return pd.read_sql('SELECT path, error FROM errors', connection)
+    finally:
+        connection.close()
+
+
+def load_catalog(catalog=CATALOG_FILE):
+    """Table with a row per (file, metric, component, carrier) and a column
+    per scenario parameter"""
+
+    connection = connect(catalog)
+    try:
+        files = pd.read_sql('SELECT path, scenario FROM files', connection)
+        metrics = pd.read_sql('SELECT * FROM metrics', connection)
+    finally:
+        connection.close()
+    scenarios = pd.DataFrame([json.loads(s) for s in files.scenario],
+                             index=files.path)
+    # integers also when some files do not have the parameter
+    integers = [key for _, types in FILENAME_PATTERNS
+                for key, typ in types.items() if typ is int]
+    for column in scenarios.columns.intersection(integers):
+        scenarios[column] = scenarios[column].astype('Int64')
+    for column in scenarios.columns[scenarios.columns.str.endswith(
+            '_default')]:
+        scenarios[column] = scenarios[column].fillna(False).astype(bool)
+    metrics['file'] = metrics.path.map(os.path.basename)
+    return metrics.join(scenarios, on='path')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('directories', nargs='+')
+    parser.add_argument('--catalog', default=CATALOG_FILE)
+    parser.add_argument('--processes', type=int)
+    args = parser.parse_args()
+
+    processed = refresh_catalog(args.directories, args.catalog,
+                                args.processes)
+    errors = catalog_errors(args.catalog)
+    print('{} files processed, {} files in the catalog could not be read'
+          .format(len(processed), len(errors)))
+    if len(errors):
+        print(errors.to_string(index=False))
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Dispatch over many weather years with fixed capacities, solved in rolling
+horizon.
+
+The capacities are taken from a solved network (e.g. the optimal capacities
+for 2015) and the dispatch is solved for consecutive windows of the weather
+years (by default one week) that overlap with the next window (by default
+one day), so that the storage is not emptied at the end of every window.
+Only the snapshots before the overlap are kept, and the state of charge of
+the stores (e.g. H2 tanks) and storage units (e.g. hydro) at the last of them
+is the initial state of the next window, also from one weather year to the
+next one.
+
+The results of every window are appended to an HDF5 file as soon as the
+window is solved, so the memory needed depends on the length of the window
+and not on the number of weather years, e.g.
+
+from rolling_horizon import rolling_dispatch
+
+solved = pypsa.Network('results/DNK-NOR-SWE_2015.nc')
+rolling_dispatch(solved, ['DNK', 'NOR', 'SWE'], range(1979, 2018),
+                 h2_storage=True)
+pd.read_hdf(RESULTS_FILE, 'generators_t/p')
+"""
+
+import os
+
+import pandas as pd
+
+from capacity_factors import weather_year_index
+from network_cache import cached_build_network
+from solve_network import solve_network
+
+RESULTS_FILE = 'results/rolling_dispatch.h5'
+
+# time series written for every window
+RESULTS = {'generators_t': ['p'],
+           'storage_units_t': ['p', 'state_of_charge', 'spill'],
+           'stores_t': ['p', 'e'],
+           'links_t': ['p0', 'p1'],
+           'buses_t': ['marginal_price']}
+
+VOLL = 10000 # value of lost load in €/MWh
+
+# nominal attribute of every component with extendable capacity
+NOMINAL_ATTRS = {'generators': 'p_nom', 'storage_units': 'p_nom',
+                 'links': 'p_nom', 'stores': 'e_nom'}
+
+
+def fix_capacities(network, solved):
+    """Set the capacities of the extendable components of network to the
+    optimal capacities in solved and remove the global constraints, which
+    apply to a whole year and not to every window"""
+
+    for list_name, attr in NOMINAL_ATTRS.items():
+        static = getattr(network, list_name)
+        extendable = static.index[static[attr + '_extendable']]
+        optimal = getattr(solved, list_name)[attr + '_opt']
+        static.loc[extendable, attr] = optimal.reindex(extendable).values
+        static.loc[extendable, attr + '_extendable'] = False
+    network.remove('GlobalConstraint', network.global_constraints.index)
+    # the state of charge is passed from one window to the next
+    network.stores['e_cyclic'] = False
+    network.storage_units['cyclic_state_of_charge'] = False
+
+
+def add_load_shedding(network, voll=VOLL):
+    """Generator at every bus with a load supplying the demand that the
+    fixed capacities cannot supply, at the value of lost load"""
+
+    buses = network.loads.bus.unique()
+    network.add("Carrier", "load shedding")
+    network.add("Generator", pd.Index(buses) + " load shedding",
+                bus=buses,
+                carrier="load shedding",
+                p_nom=network.loads_t.p_set.max().max()*10,
+                marginal_cost=voll)
+
+
+def initial_state(solved):
+    """State of charge of stores and storage units at the first snapshot of
+    the solved network"""
+
+    return {'stores': solved.stores_t.e.iloc[0]
+                      if len(solved.stores_t.e.columns) else pd.Series(),
+            'storage_units': solved.storage_units_t.state_of_charge.iloc[0]
+                             if len(solved.storage_units_t.state_of_charge
+                                    .columns) else pd.Series()}
+
+
+def set_state(network, state):
+    """Initial state of charge of the stores and storage units"""
+
+    stores = state['stores'].reindex(network.stores.index).dropna()
+    network.stores.loc[stores.index, 'e_initial'] = stores
+    units = state['storage_units'].reindex(network.storage_units.index)
+    units = units.dropna()
+    network.storage_units.loc[units.index,
+                              'state_of_charge_initial'] = units
+
+
+def state_at(network, snapshot):
+    """State of charge of the stores and storage units at snapshot"""
+
+    return {'stores': network.stores_t.e.loc[snapshot],
+            'storage_units':
+                network.storage_units_t.state_of_charge.loc[snapshot]}
+
+
+def windows(snapshots, window=168, overlap=24):
+    """(snapshots solved, snapshots kept) for every window"""
+
+    for start in range(0, len(snapshots), window):
+        yield (snapshots[start:start + window + overlap],
+               snapshots[start:start + window])
+
+
+def write_window(store, network, kept, weather_year):
+    """Append the results of the snapshots kept to the HDF5 store, indexed by
+    the hours of the weather year"""
+
+    # the appended tables need the same time unit in every window, whether
+    # the network was built or loaded from the cache
+    index = weather_year_index(kept, weather_year).as_unit('ns')
+    for list_name, attrs in RESULTS.items():
+        series = getattr(network, list_name)
+        for attr in attrs:
+            df = series[attr]
+            if df.empty:
+                continue
+            df = df.loc[kept].astype(float)
+            df.index = index
+            store.append('{}/{}'.format(list_name, attr), df, format='table')
+
+
+def rolling_dispatch(solved, countries, weather_years, h2_storage=False,
+                     window=168, overlap=24, path=RESULTS_FILE,
+                     solver_name=None, mode='default', threads=None,
+                     options=None, voll=VOLL):
+    """Dispatch the capacities of the solved network in the networks of
+    countries for every weather year, in windows of window hours
+    overlapping overlap hours with the next one. The results are written to
+    the HDF5 file in path and the objective of every window is returned."""
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+
+    state = initial_state(solved)
+    summary = []
+    with pd.HDFStore(path, mode='w', complevel=5) as store:
+        for weather_year in weather_years:
+            network = cached_build_network(countries, weather_year,
+                                           h2_storage)
+            fix_capacities(network, solved)
+            add_load_shedding(network, voll)
+            for solved_sns, kept in windows(network.snapshots, window,
+                                            overlap):
+                set_state(network, state)
+                status, condition = solve_network(
+                    network, solver_name, mode, threads, options,
+                    snapshots=solved_sns)
+                if status != 'ok':
+                    raise RuntimeError('window starting at {} of weather '
+                                       'year {} could not be solved: {}'
+                                       .format(kept[0], weather_year,
+                                               condition))
+                write_window(store, network, kept, weather_year)
+                state = state_at(network, kept[-1])
+                start, end = weather_year_index(kept[[0, -1]], weather_year)
+                summary.append({'weather_year': weather_year,
+                                'start': start.isoformat(),
+                                'end': end.isoformat(),
+                                'objective': network.objective})
+        summary = pd.DataFrame(summary)
+        store.put('windows', summary, format='table')
+    return summary
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Solve the networks with the best solver available on the machine.
+
+The solver is chosen in the order of SOLVER_PREFERENCE among the solvers
+installed (linopy.available_solvers), unless one is requested explicitly or
+through the environment variable MESM_SOLVER. A commercial solver is only
+chosen if it solves a test model larger than the size-limited licences
+allow, so that HiGHS is picked on the batch nodes without Gurobi licence.
+The solver can also be set explicitly:
+
+MESM_SOLVER=highs python weather_years.py
+
+Every solver has tuned options for three modes:
+
+'default'   : barrier with crossover, exact capacities, prices and CO2 price
+'screening' : barrier without crossover and looser tolerances, for fast
+              screening studies (dual values are less accurate)
+'simplex'   : dual simplex, useful when the solve starts from the basis of a
+              similar problem (warm start)
+
+The options are similar to those in the PyPSA-Eur configuration
+https://github.com/PyPSA/pypsa-eur/blob/master/config/config.default.yaml
+"""
+
+import functools
+import os
+
+import linopy
+import pandas as pd
+
+from instrumentation import phase
+
+SOLVER_PREFERENCE = ['gurobi', 'cplex', 'xpress', 'highs', 'cbc', 'glpk']
+
+# solvers that need a licence, which are installed without one or with a
+# licence limited to a few thousand variables
+COMMERCIAL_SOLVERS = ['gurobi', 'cplex', 'xpress']
+
+# number of variables of the model solved to check the licence
+LICENCE_TEST_SIZE = 5001
+
+SOLVER_OPTIONS = {
+    'gurobi': {
+        'default': {'Method': 2, 'BarConvTol': 1.e-6,
+                    'Seed': 123, 'AggFill': 0, 'PreDual': 0},
+        'screening': {'Method': 2, 'Crossover': 0, 'BarConvTol': 1.e-5,
+                      'FeasibilityTol': 1.e-5, 'OptimalityTol': 1.e-5,
+                      'Seed': 123, 'AggFill': 0, 'PreDual': 0},
+        'simplex': {'Method': 1},
+    },
+    'cplex': {
+        'default': {'lpmethod': 4, 'solutiontype': 1},
+        'screening': {'lpmethod': 4, 'solutiontype': 2,
+                      'barrier.convergetol': 1.e-5},
+        'simplex': {'lpmethod': 2},
+    },
+    'xpress': {
+        'default': {'defaultalg': 4, 'crossover': 1},
+        'screening': {'defaultalg': 4, 'crossover': 0,
+                      'bargapstop': 1.e-5},
+        'simplex': {'defaultalg': 2},
+    },
+    'highs': {
+        'default': {'solver': 'ipm', 'run_crossover': 'on',
+                    'small_matrix_value': 1.e-6, 'large_matrix_value': 1.e9,
+                    'random_seed': 123},
+        'screening': {'solver': 'ipm', 'run_crossover': 'off',
+                      'small_matrix_value': 1.e-6, 'large_matrix_value': 1.e9,
+                      'primal_feasibility_tolerance': 1.e-5,
+                      'dual_feasibility_tolerance': 1.e-5,
+                      'ipm_optimality_tolerance': 1.e-4,
+                      'random_seed': 123},
+        'simplex': {'solver': 'simplex', 'simplex_strategy': 1},
+    },
+    'cbc': {'default': {}, 'screening': {}, 'simplex': {}},
+    'glpk': {'default': {}, 'screening': {}, 'simplex': {}},
+}
+
+# solvers for which linopy can write a basis file and start from it
+WARMSTART_SOLVERS = ['gurobi', 'highs', 'cplex', 'xpress']
+
+# name of the option setting the number of threads
+THREADS_OPTION = {'gurobi': 'Threads', 'cplex': 'threads',
+                  'xpress': 'threads', 'highs': 'threads', 'cbc': 'threads'}
+
+
+@functools.lru_cache(maxsize=None)
+def has_licence(solver_name):
+    """Whether solver_name solves a model with LICENCE_TEST_SIZE variables,
+    which is over the limits of the size-limited licences"""
+
+    model = linopy.Model()
+    x = model.add_variables(lower=0, coords=[pd.RangeIndex(
+        LICENCE_TEST_SIZE, name='i')], name='x')
+    model.add_constraints(x.sum() >= 1)
+    model.add_objective(x.sum())
+    try:
+        status, condition = model.solve(solver_name=solver_name)
+    except Exception:
+        return False
+    return status == 'ok'
+
+
+def pick_solver(solver_name=None):
+    """Name of the solver to use: solver_name, the environment variable
+    MESM_SOLVER or the first solver in SOLVER_PREFERENCE that is installed
+    (and licensed for the commercial solvers)"""
+
+    available = linopy.available_solvers
+    if solver_name is None:
+        solver_name = os.environ.get('MESM_SOLVER')
+    if solver_name is not None:
+        if solver_name not in available:
+            raise ValueError('solver {} is not available, the solvers '
+                             'installed are {}'.format(solver_name, available))
+        return solver_name
+    for solver_name in SOLVER_PREFERENCE:
+        if solver_name in available and (
+                solver_name not in COMMERCIAL_SOLVERS
+                or has_licence(solver_name)):
+            return solver_name
+    raise RuntimeError('none of the solvers {} is installed and licensed'
+                       .format(SOLVER_PREFERENCE))
+
+
+def solver_options(solver_name, mode='default', threads=None, **options):
+    """Tuned options of solver_name for mode, with the number of threads and
+    any other option given as keyword argument"""
+
+    if mode not in SOLVER_OPTIONS[solver_name]:
+        raise ValueError("mode must be 'default', 'screening' or 'simplex', "
+                         "not {!r}".format(mode))
+    selected = dict(SOLVER_OPTIONS[solver_name][mode])
+    if threads is not None and solver_name in THREADS_OPTION:
+        selected[THREADS_OPTION[solver_name]] = threads
+    selected.update(options)
+    return selected
+
+
+def solve_network(network, solver_name=None, mode='default', threads=None,
+                  options=None, **kwargs):
+    """Optimize network with the solver picked by pick_solver and its tuned
+    options for mode. options updates the solver options and kwargs are
+    passed to network.optimize (e.g. extra_functionality, warmstart_fn).
+    Returns the status and condition of the optimization."""
+
+    solver_name = pick_solver(solver_name)
+    with phase('optimize', solver=solver_name, mode=mode):
+        return network.optimize(solver_name=solver_name,
+                                solver_options=solver_options(
+                                    solver_name, mode, threads,
+                                    **(options or {})),
+                                **kwargs)
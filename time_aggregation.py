@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+"""
+Time series aggregation to reduce the number of snapshots before
+network.optimize, e.g. 8760 hours -> ~500 snapshots for screening studies.
+
+Three methods are available:
+
+'segments' : the year is divided into variable-length segments of
+    consecutive hours, merging first the neighbouring hours that are most
+    similar (demand, capacity factors and the rest of the input time series).
+    Every segment is a snapshot with weighting equal to its length, so the
+    chronology and the storage behaviour are kept.
+
+'resample' : segments of the same length, e.g. 2920 snapshots of 3 hours,
+    as the 3H option of PyPSA-Eur.
+
+'days' : the days are clustered (k-means) into k representative days. The
+    snapshots are the hours of the day closest to the centre of every
+    cluster, weighted by the number of days in the cluster. The stores are
+    linked between days following Kotzur et al. (2018),
+    https://doi.org/10.1016/j.apenergy.2018.01.023 : the state of charge
+    within every representative day is added to an inter-day state of
+    charge, defined for every day of the year, that evolves with the net
+    charge of the representative day of that day. Stores and storage units
+    (e.g. hydro, with inflow and spill) are linked, also with standing
+    losses. Stores with e_min_pu or e_max_pu should use segments.
+
+e.g.
+
+aggregated, extra_functionality = aggregate(network, 'segments', 500)
+solve_network(aggregated, extra_functionality=extra_functionality)
+aggregation_error(network, aggregated)  # network solved at full resolution
+"""
+
+import heapq
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from scipy.cluster.vq import kmeans2
+
+from solve_network import solve_network
+
+
+def _input_timeseries(network):
+    """Non-empty time series of every component as {(list_name, attr): df}"""
+
+    series = {}
+    for c in network.iterate_components():
+        for attr, df in c.pnl.items():
+            if not df.empty and c.attrs.loc[attr, 'status'].startswith('Input'):
+                series[(c.list_name, attr)] = df
+    return series
+
+
+def _features(network):
+    """(snapshots x features) array with every input time series scaled to
+    its maximum absolute value"""
+
+    values = [df.values for df in _input_timeseries(network).values()]
+    if not values:
+        return np.zeros((len(network.snapshots), 1))
+    features = np.hstack(values).astype(float)
+    scale = np.abs(features).max(axis=0)
+    scale[scale == 0] = 1
+    return features/scale
+
+
+def segment_starts(features, n_segments):
+    """Positions where every segment starts when consecutive rows of
+    features are merged into n_segments, merging first the neighbouring
+    segments that increase least the sum of squared deviations (Ward)"""
+
+    T = len(features)
+    if n_segments >= T:
+        return np.arange(T)
+    size = np.ones(T)
+    total = features.astype(float).copy()
+    nxt = np.arange(1, T + 1)
+    prv = np.arange(-1, T - 1)
+    alive = np.ones(T, dtype=bool)
+    version = np.zeros(T, dtype=int)
+
+    def cost(a, b):
+        diff = total[a]/size[a] - total[b]/size[b]
+        return size[a]*size[b]/(size[a] + size[b])*diff.dot(diff)
+
+    heap = [(cost(a, a + 1), a, a + 1, 0, 0) for a in range(T - 1)]
+    heapq.heapify(heap)
+    for _ in range(T - n_segments):
+        while True:
+            _, a, b, va, vb = heapq.heappop(heap)
+            if alive[a] and alive[b] and version[a] == va and version[b] == vb:
+                break
+        # merge b into a
+        size[a] += size[b]
+        total[a] += total[b]
+        alive[b] = False
+        nxt[a] = nxt[b]
+        if nxt[a] < T:
+            prv[nxt[a]] = a
+        version[a] += 1
+        if prv[a] >= 0:
+            p = prv[a]
+            heapq.heappush(heap, (cost(p, a), p, a, version[p], version[a]))
+        if nxt[a] < T:
+            q = nxt[a]
+            heapq.heappush(heap, (cost(a, q), a, q, version[a], version[q]))
+    return np.flatnonzero(alive)
+
+
+def segment(network, n_segments):
+    """Aggregated copy of network with n_segments variable-length segments"""
+
+    starts = segment_starts(_features(network), n_segments)
+    return _aggregate_segments(network, starts)
+
+
+def resample(network, n_snapshots):
+    """Aggregated copy of network with n_snapshots segments of the same
+    length (e.g. 2920 snapshots of 3 hours for a year)"""
+
+    starts = np.arange(n_snapshots)*len(network.snapshots)//n_snapshots
+    return _aggregate_segments(network, starts)
+
+
+def _aggregate_segments(network, starts):
+    """Copy of network with a snapshot for every segment starting at the
+    positions in starts"""
+
+    weightings = network.snapshot_weightings
+    elapsed = np.add.reduceat(weightings.values, starts, axis=0)
+
+    aggregated = network.copy(snapshots=network.snapshots[starts])
+    for (list_name, attr), df in _input_timeseries(network).items():
+        # average over the segment, weighted by the duration of the snapshots
+        w = weightings.generators.values[:, None]
+        values = (np.add.reduceat(df.values*w, starts, axis=0)
+                  /np.add.reduceat(w, starts, axis=0))
+        getattr(aggregated, list_name + '_t')[attr] = pd.DataFrame(
+            values, index=aggregated.snapshots, columns=df.columns)
+    aggregated.snapshot_weightings = pd.DataFrame(
+        elapsed, index=aggregated.snapshots, columns=weightings.columns)
+    return aggregated
+
+
+def representative_days(network, n_days, seed=0):
+    """Aggregated copy of network with n_days representative days and the
+    extra_functionality that links the stores and storage units between
+    days. Raises ValueError for stores with e_min_pu or e_max_pu, which are
+    not considered in the inter-day state of charge."""
+
+    stores = network.stores
+    if (not network.stores_t.e_min_pu.empty or not
+            network.stores_t.e_max_pu.empty or (stores.e_min_pu != 0).any()
+            or (stores.e_max_pu != 1).any()):
+        raise ValueError('the inter-day state of charge is only bounded by 0 '
+                         'and the energy capacity, stores with e_min_pu or '
+                         'e_max_pu cannot be linked between representative '
+                         'days, use segments')
+
+    dates = network.snapshots.normalize()
+    days = dates.unique()
+    steps = len(network.snapshots)//len(days)
+    if steps*len(days) != len(network.snapshots):
+        raise ValueError('representative days need the same number of '
+                         'snapshots in every day')
+
+    features = _features(network).reshape(len(days), -1)
+    centroids, labels = kmeans2(features, n_days, seed=seed, minit='++')
+    # the representative of every cluster is the day closest to its centre
+    clusters = np.unique(labels)
+    medoids = np.array([
+        np.flatnonzero(labels == c)[
+            ((features[labels == c] - centroids[c])**2).sum(axis=1).argmin()]
+        for c in clusters])
+    order = np.argsort(medoids)
+    medoids, clusters = medoids[order], clusters[order]
+    counts = np.array([(labels == c).sum() for c in clusters])
+
+    snapshots = network.snapshots[np.isin(dates, days[medoids])]
+    aggregated = network.copy(snapshots=snapshots)
+    weightings = network.snapshot_weightings.loc[snapshots].copy()
+    weightings[['objective', 'generators']] = weightings[
+        ['objective', 'generators']].mul(np.repeat(counts, steps), axis=0)
+    aggregated.snapshot_weightings = weightings
+
+    # first snapshot of the representative day of every day of the year
+    position = np.empty(clusters.max() + 1, dtype=int)
+    position[clusters] = np.arange(len(clusters))
+    day_start = snapshots[::steps][position[labels]]
+    return aggregated, link_stores_between_days(day_start, steps)
+
+
+# state of charge, cyclic and initial state attributes of the storage
+# components linked between representative days
+STORAGE_ATTRS = {'Store': ('e', 'e_cyclic', 'e_initial'),
+                 'StorageUnit': ('state_of_charge', 'cyclic_state_of_charge',
+                                 'state_of_charge_initial')}
+
+
+def _as_array(df, dim):
+    """(snapshot x component) DataArray of df with the dimension of the
+    components named dim"""
+
+    return xr.DataArray(df.values, coords={'snapshot': df.index,
+                                           dim: pd.Index(df.columns,
+                                                         name=dim)})
+
+
+def _charge(n, component, snapshots, elapsed, dim):
+    """Energy charged in every snapshot without the standing losses, as a
+    linear expression and a constant (the inflow of the storage units)"""
+
+    m = n.model
+    if component == 'Store':
+        return -elapsed*m['Store-p'], 0
+    dense = {attr: _as_array(n.get_switchable_as_dense(
+                 'StorageUnit', attr, snapshots), dim)
+             for attr in ['efficiency_store', 'efficiency_dispatch',
+                          'inflow']}
+    charge = (dense['efficiency_store']*elapsed*m['StorageUnit-p_store']
+              - elapsed/dense['efficiency_dispatch']
+              *m['StorageUnit-p_dispatch'])
+    if 'StorageUnit-spill' in m.variables:
+        # the spill is only defined for the storage units with inflow
+        charge = charge - elapsed*m['StorageUnit-spill'].fillna(0)
+    return charge, elapsed*dense['inflow']
+
+
+def _energy_capacity(n, component, static, dim):
+    """Energy capacity of the extendable (as a linear expression) and fixed
+    components"""
+
+    m = n.model
+    if component == 'Store':
+        nominal, factor = 'e_nom', pd.Series(1., index=static.index)
+    else:
+        nominal, factor = 'p_nom', static.max_hours
+    extendable = static.index[static[nominal + '_extendable']]
+    fixed = static.index[~static[nominal + '_extendable']]
+    capacity = None
+    if len(extendable):
+        variable = m.variables['{}-{}'.format(component, nominal)]
+        variable = variable.sel({variable.dims[0]: extendable}).rename(
+            {variable.dims[0]: dim})
+        capacity = xr.DataArray(factor[extendable].values,
+                                coords={dim: extendable})*variable
+    return extendable, capacity, fixed, xr.DataArray(
+        (factor*static[nominal])[fixed].values, coords={dim: fixed})
+
+
+def link_stores_between_days(day_start, steps):
+    """extra_functionality for network.optimize that replaces the energy
+    balance of the stores and storage units by an intra-day balance within
+    every representative day and an inter-day state of charge for every day
+    of the year. day_start is the first snapshot of the representative day
+    of every day of the year and steps the number of snapshots per day.
+
+    With standing losses the inter-day state of charge decays within the
+    day, and it is kept within the capacity with the lowest (end of the day)
+    and highest (start of the day) share of it left, as in Kotzur et al.
+    (2018), which is slightly conservative."""
+
+    def extra_functionality(n, snapshots):
+        for component in STORAGE_ATTRS:
+            _link_between_days(n, snapshots, component, day_start, steps)
+
+    return extra_functionality
+
+
+def _link_between_days(n, snapshots, component, day_start, steps):
+    static = n.components[component].static
+    if static.empty:
+        return
+    soc_attr, cyclic_attr, initial_attr = STORAGE_ATTRS[component]
+    m = n.model
+    prefix = component + 'Day'
+    soc = m.variables['{}-{}'.format(component, soc_attr)]
+    dim = [d for d in soc.dims if d != 'snapshot'][0]
+    index = pd.Index(static.index, name=dim)
+    elapsed = xr.DataArray(n.snapshot_weightings.stores.loc[snapshots]
+                           .values, coords={'snapshot': snapshots})
+    starts = pd.Index(snapshots[::steps], name='snapshot')
+    is_start = xr.DataArray(np.isin(snapshots, starts),
+                            coords={'snapshot': snapshots})
+    # representative day of every snapshot, given by its first snapshot
+    start_of = xr.DataArray(np.repeat(starts, steps), dims='snapshot',
+                            coords={'snapshot': snapshots})
+    days = pd.RangeIndex(len(day_start), name='day')
+    start_of_day = xr.DataArray(day_start, dims='day', coords={'day': days})
+
+    # share of the state of charge kept after every snapshot and since the
+    # start of the representative day
+    standing = n.get_switchable_as_dense(component, 'standing_loss',
+                                         snapshots)
+    kept = (1 - standing.values)**elapsed.values[:, None]
+    kept_since_start = kept.reshape(len(starts), steps, -1).cumprod(
+        axis=1).reshape(kept.shape)
+    kept = _as_array(pd.DataFrame(kept, snapshots, static.index), dim)
+    kept_since_start = _as_array(pd.DataFrame(kept_since_start, snapshots,
+                                              static.index), dim)
+    kept_day = kept_since_start.isel(snapshot=slice(steps - 1, None, steps))
+    kept_day = kept_day.assign_coords(snapshot=starts)
+
+    m.remove_constraints('{}-energy_balance'.format(component))
+    charge, inflow = _charge(n, component, snapshots, elapsed, dim)
+
+    # the variables and constraints are not named after the component, so
+    # that PyPSA does not try to assign them to the network
+    # state of charge at the beginning of every representative day, within
+    # the day the state of charge evolves as in PyPSA
+    soc_start = m.add_variables(coords=[starts, index],
+                                name=prefix + '-soc_start')
+    soc_start_of = soc_start.sel(snapshot=start_of).assign_coords(
+        snapshot=snapshots)
+    # the first snapshot of every day, where the state of charge of the
+    # previous snapshot rolled over is not used, is in the next constraint
+    m.add_constraints(soc - kept*soc.roll(snapshot=1) - charge, '=', inflow,
+                      name=prefix + '-energy_balance', mask=~is_start)
+    m.add_constraints(soc - kept*soc_start_of - charge, '=', inflow,
+                      name=prefix + '-energy_balance_start', mask=is_start)
+
+    # state of charge relative to the decayed state at the start of the day
+    relative = soc - kept_since_start*soc_start_of
+    # net charge of every representative day, at its first snapshot
+    delta = relative.isel(snapshot=slice(steps - 1, None, steps))
+    delta = delta.assign_coords(snapshot=starts)
+
+    # highest and lowest relative state of charge within every
+    # representative day
+    soc_max = m.add_variables(coords=[starts, index],
+                              name=prefix + '-soc_max')
+    soc_min = m.add_variables(coords=[starts, index],
+                              name=prefix + '-soc_min')
+    m.add_constraints(relative - soc_max.sel(snapshot=start_of)
+                      .assign_coords(snapshot=snapshots), '<=', 0,
+                      name=prefix + '-soc_max-upper')
+    m.add_constraints(relative - soc_min.sel(snapshot=start_of)
+                      .assign_coords(snapshot=snapshots), '>=', 0,
+                      name=prefix + '-soc_min-lower')
+
+    # state of charge at the beginning of every day of the year
+    inter = m.add_variables(coords=[pd.RangeIndex(len(days) + 1, name='day'),
+                                    index],
+                            name=prefix + '-soc_inter', lower=0)
+    inter_days = inter.isel(day=slice(None, -1))
+    kept_of_day = kept_day.sel(snapshot=start_of_day).drop_vars('snapshot')
+    m.add_constraints(inter.isel(day=slice(1, None)).assign_coords(day=days)
+                      - kept_of_day*inter_days
+                      - delta.sel(snapshot=start_of_day).drop_vars('snapshot'),
+                      '=', 0, name=prefix + '-soc_inter_balance')
+    cyclic = static.index[static[cyclic_attr]]
+    if len(cyclic):
+        m.add_constraints(inter.sel({'day': len(days), dim: cyclic},
+                                    drop=True)
+                          - inter.sel({'day': 0, dim: cyclic}, drop=True),
+                          '=', 0,
+                          name=prefix + '-soc_inter_cyclic')
+    initial = static.index[~static[cyclic_attr]]
+    if len(initial):
+        m.add_constraints(inter.sel({'day': 0, dim: initial}), '=',
+                          xr.DataArray(static[initial_attr][initial].values,
+                                       coords={dim: initial}),
+                          name=prefix + '-soc_inter_initial')
+
+    # the state of charge during every day stays within the capacity
+    lowest = (kept_of_day*inter_days + soc_min.to_linexpr()
+              .sel(snapshot=start_of_day).drop_vars('snapshot'))
+    highest = (inter_days + soc_max.to_linexpr().sel(snapshot=start_of_day)
+               .drop_vars('snapshot'))
+    m.add_constraints(lowest, '>=', 0, name=prefix + '-soc_inter-lower')
+    extendable, capacity, fixed, fixed_capacity = _energy_capacity(
+        n, component, static, dim)
+    if len(extendable):
+        m.add_constraints(highest.sel({dim: extendable}) - capacity, '<=', 0,
+                          name=prefix + '-ext-soc_inter-upper')
+    if len(fixed):
+        m.add_constraints(highest.sel({dim: fixed}), '<=', fixed_capacity,
+                          name=prefix + '-fix-soc_inter-upper')
+
+
+def aggregate(network, method='segments', size=500, seed=0):
+    """Aggregated copy of network and the extra_functionality to pass to
+    network.optimize (None for segments and resample). size is the number
+    of segments or of representative days."""
+
+    if method == 'segments':
+        return segment(network, size), None
+    if method == 'resample':
+        return resample(network, size), None
+    if method == 'days':
+        return representative_days(network, size, seed=seed)
+    raise ValueError("method must be 'segments', 'resample' or 'days', not "
+                     "{!r}".format(method))
+
+
+def optimal_capacities(network):
+    """Optimal capacity of every extendable component"""
+
+    capacities = {}
+    for list_name, attr in [('generators', 'p_nom'), ('links', 'p_nom'),
+                            ('storage_units', 'p_nom'), ('stores', 'e_nom')]:
+        static = getattr(network, list_name)
+        static = static[static[attr + '_extendable']]
+        capacities.update({(list_name, name): value for name, value
+                           in static[attr + '_opt'].items()})
+    return pd.Series(capacities, dtype=float)
+
+
+def aggregation_error(network, aggregated):
+    """Objective and optimal capacities of the solved full resolution
+    network and of the solved aggregated network, with the relative error"""
+
+    full = pd.concat([pd.Series({('objective', 'objective'):
+                                 network.objective}),
+                      optimal_capacities(network)])
+    approx = pd.concat([pd.Series({('objective', 'objective'):
+                                   aggregated.objective}),
+                        optimal_capacities(aggregated)])
+    error = pd.DataFrame({'full': full, 'aggregated': approx})
+    error['relative_error'] = ((error.aggregated - error.full)
+                               /error.full.abs().where(error.full != 0))
+    return error
+
+
+def compare_with_full(network, method='segments', size=500, seed=0,
+                      **solve_kwargs):
+    """Solve network at full resolution and aggregated, and return the
+    approximation error of the aggregated run. solve_kwargs are passed to
+    solve_network (e.g. solver_name, mode)."""
+
+    aggregated, extra_functionality = aggregate(network, method, size, seed)
+    solve_network(network, **solve_kwargs)
+    solve_network(aggregated, extra_functionality=extra_functionality,
+                  **solve_kwargs)
+    return aggregation_error(network, aggregated)
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Check the constraints of the electric vehicles in a PyPSA-Eur network for
+every node, build year and snapshot at once.
+
+check_transport_constraint_Sina.py checked the equations of the paper by hand
+for some components of 'DE1 0' and the first snapshot. Here the node and build
+year are parsed from the names of the components (e.g.
+'DE1 0 BEV charger-2040' -> node 'DE1 0', technology 'BEV charger', year
+2040) and every equation is checked with grouped operations:
+
+Eq. 1  the EV links of all build years supply the land transport load of the
+       node, at every snapshot
+Eq. 2  the BEV chargers do not charge more than their availability
+       (p_nom_opt*p_max_pu), at every snapshot
+Eq. 3  the BEV chargers and V2G links of every build year have the same
+       capacity
+Eq. 4  the cars implied by the capacity of the chargers of all build years
+       (0.011 MW per car) do not exceed the cars of the node, for the
+       nodes whose number of cars is given
+Eq. 5  the EV battery storage is 9.5 times the capacity of the EV links
+       (0.050 MWh and 0.01 MW per car)
+cars   the cars implied by the chargers and by the battery storage (0.100
+       MWh per car) of every build year are the same
+
+The result is a table with the violations, e.g.
+
+n = pypsa.Network("elec_s_37_lv1.0__3H-T-H-B-I-A-solar+p3-dist1-cb25.7ex0_2050.nc")
+violations = validate_transport(n)
+violations.groupby('equation').size()
+"""
+
+import argparse
+
+import pandas as pd
+
+from network_io import open_network
+
+# components of the electric vehicles, the build year is optional for the
+# loads
+NAME_PATTERN = (r'^(?P<node>.+?) (?P<technology>land transport EV|BEV charger'
+                r'|V2G|EV battery storage|land transport)'
+                r'(?:-(?P<year>\d{4}))?$')
+
+CHARGER_PER_CAR = 0.011 # charging capacity in MW per car
+EV_PER_CAR = 0.01 # capacity of the land transport EV link in MW per car
+STORAGE_PER_CAR = 0.050 # EV battery storage in MWh per car in Eq. 5
+BATTERY_PER_CAR = 0.100 # energy capacity of the battery in MWh per car
+EQ5_COEFFICIENT = 9.5
+
+RTOL = 1e-3
+ATOL = 1e-2
+
+COLUMNS = ['equation', 'node', 'year', 'snapshot', 'lhs', 'rhs',
+           'difference']
+
+
+def parse_names(index):
+    """Node, technology and build year of the EV components in index, the
+    other components are dropped"""
+
+    parsed = pd.Series(index, index=index, dtype=object).str.extract(
+        NAME_PATTERN)
+    parsed = parsed.dropna(subset=['technology'])
+    parsed['year'] = pd.to_numeric(parsed.year)
+    return parsed
+
+
+def _by_node_year(values, parsed, technology):
+    """values of technology indexed by (node, year)"""
+
+    names = parsed.index[parsed.technology == technology]
+    return pd.Series(values.reindex(names).values,
+                     index=pd.MultiIndex.from_frame(
+                         parsed.loc[names, ['node', 'year']]))
+
+
+def _compare(equation, lhs, rhs, relation='==', rtol=RTOL, atol=ATOL):
+    """Long table of lhs and rhs (Series with the same index or DataFrames
+    with snapshots as rows and nodes as columns)"""
+
+    if isinstance(lhs, pd.DataFrame):
+        lhs, rhs = lhs.align(rhs, join='outer')
+        lhs = lhs.rename_axis(index='snapshot', columns='node').stack()
+        rhs = rhs.rename_axis(index='snapshot', columns='node').stack()
+    else:
+        lhs, rhs = lhs.align(rhs, join='outer')
+    table = pd.DataFrame({'lhs': lhs, 'rhs': rhs}).reset_index()
+    table['equation'] = equation
+    table['difference'] = table.lhs - table.rhs
+    tolerance = atol + rtol*table.rhs.abs()
+    if relation == '==':
+        ok = table.difference.abs() <= tolerance
+    else:
+        ok = table.difference <= tolerance
+    table['violated'] = ~ok.fillna(False)
+    return table.reindex(columns=COLUMNS + ['violated'])
+
+
+def transport_checks(network, cars=None, rtol=RTOL, atol=ATOL):
+    """Table with a row for every equation, node, build year and (for Eq. 1
+    and 2) snapshot, the left and right hand side and whether it is
+    violated. cars is the number of cars by node, Eq. 4 is only checked for
+    the nodes in cars."""
+
+    links = parse_names(network.links.index)
+    stores = parse_names(network.stores.index)
+    loads = parse_names(network.loads.index)
+    p_nom = network.links.p_nom_opt
+    e_nom = network.stores.e_nom_opt
+    tables = []
+
+    # Eq. 1, energy balance of the land transport
+    ev = links.index[links.technology == 'land transport EV']
+    supply = -network.links_t.p1.reindex(columns=ev).T.groupby(
+        links.node[ev]).sum().T
+    transport = loads.index[loads.technology == 'land transport']
+    demand = network.loads_t.p.reindex(columns=transport).T.groupby(
+        loads.node[transport]).sum().T
+    tables.append(_compare('Eq. 1', supply, demand, rtol=rtol, atol=atol))
+
+    # Eq. 2, charging within the availability of the cars
+    chargers = links.index[links.technology == 'BEV charger']
+    p_max_pu = network.links_t.p_max_pu.reindex(columns=chargers)
+    p_max_pu = p_max_pu.fillna(network.links.p_max_pu.reindex(chargers))
+    charging = network.links_t.p0.reindex(columns=chargers)
+    table = _compare('Eq. 2', charging, p_max_pu*p_nom[chargers],
+                     relation='<=', rtol=rtol, atol=atol)
+    # one column per charger, not per node
+    table['year'] = links.year.reindex(table.node).values
+    table['node'] = links.node.reindex(table.node).values
+    tables.append(table)
+
+    # Eq. 3, same capacity for charging and discharging
+    tables.append(_compare('Eq. 3', _by_node_year(p_nom, links, 'BEV charger'),
+                           _by_node_year(p_nom, links, 'V2G'),
+                           rtol=rtol, atol=atol))
+
+    # Eq. 4, cars in the node
+    cars_charger = _by_node_year(p_nom, links, 'BEV charger')/CHARGER_PER_CAR
+    if cars is not None:
+        # only the nodes with a number of cars are checked
+        cars = pd.Series(cars, dtype=float).dropna()
+        total = cars_charger.groupby(level='node').sum()
+        total = total[total.index.isin(cars.index)]
+        tables.append(_compare('Eq. 4', total, cars.reindex(total.index),
+                               relation='<=', rtol=rtol, atol=atol))
+
+    # Eq. 5, battery storage and EV links
+    tables.append(_compare(
+        'Eq. 5',
+        _by_node_year(e_nom, stores, 'EV battery storage')/STORAGE_PER_CAR,
+        _by_node_year(p_nom, links, 'land transport EV')/EV_PER_CAR
+        *EQ5_COEFFICIENT, rtol=rtol, atol=atol))
+
+    # cars implied by the chargers and by the batteries
+    tables.append(_compare(
+        'cars', cars_charger,
+        _by_node_year(e_nom, stores, 'EV battery storage')/BATTERY_PER_CAR,
+        rtol=rtol, atol=atol))
+
+    tables = [t for t in tables if not t.empty]
+    if not tables:
+        return pd.DataFrame(columns=COLUMNS + ['violated'])
+    return pd.concat(tables, ignore_index=True)
+
+
+def validate_transport(network, cars=None, rtol=RTOL, atol=ATOL):
+    """Violations of the EV constraints, see transport_checks"""
+
+    checks = transport_checks(network, cars, rtol, atol)
+    return checks[checks.violated].drop(columns='violated').reset_index(
+        drop=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('network')
+    parser.add_argument('--output', help='csv file for the violations')
+    args = parser.parse_args()
+
+    with open_network(args.network) as network:
+        checks = transport_checks(network)
+    print(checks.groupby('equation').violated.agg(['size', 'sum']).rename(
+        columns={'size': 'checked', 'sum': 'violated'}))
+    if args.output:
+        checks[checks.violated].drop(columns='violated').to_csv(
+            args.output, index=False)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Sensitivity of the results to the interannual variability of solar and wind
+generation (Task C in MESM_project.py).
+
+The network of every weather year is built from the cached demand and
+capacity factors (see network_builder.py), or loaded from the cache of built
+networks if it was built before (see network_cache.py), and the years are
+solved in parallel worker processes. The capacities and dispatch statistics
+of every year are appended to a csv file as soon as the year is solved, so
+an interrupted run keeps the years already finished. At the end, the mean
+and variance across weather years are reported for every technology, e.g.
+
+python weather_years.py DNK NOR SWE --years 2010 2015 --h2-storage
+
+from weather_years import run_weather_years
+
+summary = run_weather_years('ESP', range(1979, 2018))
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from network_builder import set_co2_limit
+from network_cache import cached_build_network
+from solve_network import solve_network
+
+RESULTS_FILE = 'results/weather_years.csv'
+
+COLUMNS = ['countries', 'weather_year', 'quantity', 'name', 'carrier',
+           'value']
+
+
+def dispatch_statistics(network):
+    """Optimal capacities and dispatch statistics of a solved network as
+    (quantity, name, carrier, value) records"""
+
+    records = []
+    components = [(network.generators, 'p_nom_opt'),
+                  (network.links, 'p_nom_opt'),
+                  (network.stores, 'e_nom_opt'),
+                  (network.storage_units, 'p_nom_opt')]
+    for static, attr in components:
+        records += [(attr, name, carrier, value) for name, carrier, value
+                    in zip(static.index, static.carrier, static[attr])]
+
+    generators = network.generators
+    weightings = network.snapshot_weightings.generators
+    p = network.generators_t.p.reindex(columns=generators.index)
+    energy = p.mul(weightings, axis=0).sum()
+    p_max_pu = network.get_switchable_as_dense('Generator', 'p_max_pu')
+    available = (p_max_pu.mul(generators.p_nom_opt, axis=1)
+                 .mul(weightings, axis=0).sum())
+    hours = weightings.sum()
+    statistics = {'energy': energy,
+                  'capacity_factor': energy/(generators.p_nom_opt*hours),
+                  'curtailment': available - energy,
+                  'p_max': p.max()}
+    for quantity, values in statistics.items():
+        records += [(quantity, name, carrier, value) for name, carrier, value
+                    in zip(generators.index, generators.carrier, values)]
+    records.append(('objective', 'objective', '', network.objective))
+    return records
+
+
+def solve_weather_year(countries, weather_year, co2_limit=None,
+                       solver_name=None, mode='default', threads=None,
+                       h2_storage=False):
+    """Build and solve the network of one weather year and return the
+    records in dispatch_statistics"""
+
+    network = cached_build_network(countries, weather_year=weather_year,
+                                   h2_storage=h2_storage)
+    if co2_limit is not None:
+        set_co2_limit(network, co2_limit)
+    status, condition = solve_network(network, solver_name, mode, threads)
+    if status != 'ok':
+        return [('status', condition, '', float('nan'))]
+    return dispatch_statistics(network)
+
+
+def append_results(path, rows):
+    """Append rows to the csv file in path, the header is written only when
+    the file is created"""
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(
+        path, mode='a', index=False, header=not os.path.exists(path))
+
+
+def summarize_weather_years(path=RESULTS_FILE, countries=None):
+    """Mean and variance across weather years of the capacities and
+    dispatch statistics of every technology (carrier), summed over nodes"""
+
+    results = pd.read_csv(path)
+    results = results[results.quantity.isin(['p_nom_opt', 'e_nom_opt',
+                                             'energy', 'curtailment'])]
+    if countries is not None:
+        results = results[results.countries == _label(countries)]
+    # the last result of every year counts if a year was solved twice
+    results = results.drop_duplicates(['countries', 'weather_year',
+                                       'quantity', 'name'], keep='last')
+    per_year = results.groupby(['countries', 'quantity', 'carrier',
+                                'weather_year']).value.sum()
+    return per_year.groupby(['countries', 'quantity', 'carrier']).agg(
+        ['mean', 'var', 'min', 'max'])
+
+
+def _label(countries):
+    return countries if isinstance(countries, str) else '-'.join(countries)
+
+
+def run_weather_years(countries, weather_years, co2_limit=None,
+                      solver_name=None, mode='default', h2_storage=False,
+                      processes=None, path=RESULTS_FILE):
+    """Solve the network of countries for every weather year in parallel,
+    append the results to the csv file in path and return the summary
+    across weather years"""
+
+    weather_years = list(weather_years)
+    if processes is None:
+        processes = os.cpu_count()
+    processes = max(1, min(processes, len(weather_years)))
+    threads = max(1, os.cpu_count()//processes)
+    label = _label(countries)
+
+    with ProcessPoolExecutor(processes) as executor:
+        futures = {executor.submit(solve_weather_year, countries, year,
+                                   co2_limit, solver_name, mode, threads,
+                                   h2_storage): year
+                   for year in weather_years}
+        for future in as_completed(futures):
+            year = futures[future]
+            append_results(path, [(label, year) + record
+                                  for record in future.result()])
+
+    return summarize_weather_years(path, countries)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('countries', nargs='+',
+                        help='one country for the single-node network')
+    parser.add_argument('--years', nargs=2, type=int, default=[1979, 2017],
+                        metavar=('FIRST', 'LAST'))
+    parser.add_argument('--co2-limit', type=float)
+    parser.add_argument('--solver')
+    parser.add_argument('--mode', default='default')
+    parser.add_argument('--h2-storage', action='store_true')
+    parser.add_argument('--processes', type=int)
+    parser.add_argument('--output', default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    countries = (args.countries[0] if len(args.countries) == 1
+                 else args.countries)
+    print(run_weather_years(countries, range(args.years[0],
+                                             args.years[1] + 1),
+                            args.co2_limit, args.solver, args.mode,
+                            args.h2_storage, args.processes, args.output))
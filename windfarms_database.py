@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Wind farms of The Wind Power database (data/Windfarms_World_20180224.csv).
+
+Every field in the file is enclosed in ' and separated by ',', so the file is
+parsed once with the C parser after replacing the ',' separators. The
+capacities, number of turbines, coordinates (with decimal comma), offshore
+distance and commissioning dates are converted to typed columns:
+
+capacity            : total power in kW
+turbines            : number of turbines
+lat, lon            : coordinates WGS84
+offshore            : True for offshore plants
+shore_distance      : distance to the shore in km (offshore plants)
+commissioning_year  : year of commissioning (<NA> if unknown)
+commissioning_month : month of commissioning (<NA> if unknown)
+
+'#ND' (not defined) values become <NA>. The commissioning dates are given as
+yyyy or yyyymm, but some are written as full dates, so the year and month are
+extracted with the rules in DATE_RULES. The clean table is stored as parquet
+in 'data/cache' and read from there while the csv file does not change, e.g.
+
+plants = load_windfarms(continent='Europe', technology='onshore', year=2000)
+"""
+
+import csv
+import io
+import os
+
+import pandas as pd
+
+from data_cache import (CACHE_DIR, REPO_DIR, is_fresh, write_json,
+                        source_fingerprint)
+
+WINDFARMS_FILE = 'data/Windfarms_World_20180224.csv'
+
+# columns of the file converted to typed columns
+RAW_COLUMNS = {'capacity': 'Total power (kW)',
+               'turbines': 'Number of turbines',
+               'lat': 'Latitude (WGS84)',
+               'lon': 'Longitude (WGS84)',
+               'offshore': 'Offshore - Shore distance (km)',
+               'commissioning': 'Commissioning date (Format: yyyy or yyyymm)'}
+
+# (regex, group of the year, group of the month) applied in order to the
+# commissioning dates, the first rule that matches gives the year and month
+DATE_RULES = [(r'^(\d{4})(\d{2})?$', 0, 1), # yyyy or yyyymm
+              (r'^(\d{4})[/.-](\d{1,2})[/.-]\d{1,2}', 0, 1), # yyyy/mm/dd
+              (r'^\d{1,2}[/.-](\d{1,2})[/.-](\d{4})', 1, 0), # dd/mm/yyyy
+              (r'((?:19|20)\d{2})', 0, None)] # any year in the text
+
+
+def _cache_files():
+    base = os.path.join(CACHE_DIR, 'windfarms')
+    return {'meta': base + '.json', 'table': base + '.parquet'}
+
+
+def read_windfarms_csv(path):
+    """Parse the csv file, all the columns as strings"""
+
+    with open(path, encoding='utf-8', newline='') as f:
+        text = f.read().replace("','", '\x1f')
+    database = pd.read_csv(io.StringIO(text), sep='\x1f', engine='c',
+                           quoting=csv.QUOTE_NONE, dtype=str,
+                           keep_default_na=False)
+    # remove the ' opening and closing every line
+    first, last = database.columns[0], database.columns[-1]
+    database[first] = database[first].str.lstrip("'")
+    database[last] = database[last].str.rstrip("'")
+    return database.rename(columns={first: first.lstrip("'"),
+                                    last: last.rstrip("'")})
+
+
+def parse_commissioning(dates):
+    """Year and month of commissioning from the date strings"""
+
+    year = pd.Series(pd.NA, index=dates.index, dtype='Int64')
+    month = pd.Series(pd.NA, index=dates.index, dtype='Int64')
+    dates = dates.str.strip()
+    for pattern, year_group, month_group in DATE_RULES:
+        missing = year.isna()
+        if not missing.any():
+            break
+        groups = dates[missing].str.extract(pattern)
+        year[missing] = pd.to_numeric(groups[year_group]).astype('Int64')
+        if month_group is not None:
+            month[missing] = pd.to_numeric(groups[month_group]).astype('Int64')
+    month = month.where((month >= 1) & (month <= 12))
+    return year.astype('Int16'), month.astype('Int8')
+
+
+def _to_float(values):
+    return pd.to_numeric(values.str.replace(',', '.'), errors='coerce')
+
+
+def clean_windfarms(database):
+    """Table with typed columns from the parsed csv file"""
+
+    database = database.replace('#ND', pd.NA)
+    offshore = database[RAW_COLUMNS['offshore']]
+    year, month = parse_commissioning(
+        database[RAW_COLUMNS['commissioning']].fillna(''))
+    typed = pd.DataFrame({
+        'capacity': _to_float(database[RAW_COLUMNS['capacity']])
+                    .astype(float),
+        'turbines': pd.to_numeric(database[RAW_COLUMNS['turbines']],
+                                  errors='coerce').astype('Int32'),
+        'lat': _to_float(database[RAW_COLUMNS['lat']]),
+        'lon': _to_float(database[RAW_COLUMNS['lon']]),
+        # the distance is '#ND' for some offshore plants
+        'offshore': (offshore != 'No').fillna(True).astype(bool),
+        'shore_distance': _to_float(offshore.where(offshore != 'No')),
+        'commissioning_year': year,
+        'commissioning_month': month})
+    others = database.drop(columns=list(RAW_COLUMNS.values()))
+    # repeated text (continent, country, status...) is stored as categories
+    repeated = [c for c in others if others[c].nunique() < len(others)/2]
+    others = others.astype({c: 'category' for c in repeated})
+    return pd.concat([others, typed], axis=1)
+
+
+def build_windfarms(path=WINDFARMS_FILE):
+    """Parse and clean the csv file and store the table in the cache"""
+
+    if not os.path.isabs(path):
+        path = os.path.join(REPO_DIR, path)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    files = _cache_files()
+    table = clean_windfarms(read_windfarms_csv(path))
+    tmp = files['table'] + '.tmp%d' % os.getpid()
+    table.to_parquet(tmp)
+    os.replace(tmp, files['table'])
+    write_json(files['meta'], {'source': source_fingerprint(path)})
+    return table
+
+
+def load_windfarms(continent='Europe', status='Production', technology=None,
+                   year=None, known=True, columns=None, path=WINDFARMS_FILE):
+    """Wind farms in continent with status, technology 'onshore' or
+    'offshore' and commissioned up to year (plants with unknown date are
+    included). With known=True only the plants whose capacity, number of
+    turbines and location are known are returned. None skips a filter."""
+
+    if not os.path.isabs(path):
+        path = os.path.join(REPO_DIR, path)
+    files = _cache_files()
+    if not is_fresh(files['meta'], path):
+        build_windfarms(path)
+
+    filters = []
+    if continent is not None:
+        filters.append(('Continent', '==', continent))
+    if status is not None:
+        filters.append(('Status', '==', status))
+    if technology is not None:
+        if technology not in ('onshore', 'offshore'):
+            raise ValueError("technology must be 'onshore' or 'offshore', "
+                             "not {!r}".format(technology))
+        filters.append(('offshore', '==', technology == 'offshore'))
+    plants = pd.read_parquet(files['table'], filters=filters or None)
+
+    if known:
+        plants = plants.dropna(subset=['capacity', 'turbines', 'lat', 'lon'])
+    if year is not None:
+        plants = plants[~(plants.commissioning_year > year).fillna(False)]
+    if columns is not None:
+        plants = plants[columns]
+    return plants